@@ -1,3 +1,6 @@
 from .tools.icy_decorator import icy
 from .methods.abs import abssep
 from .tools.ps_estimator import pstimator
+from .tools.sky_simulator import skysim
+from .tools.mem_tracer import memtracer
+from .tools.blas_threads import blas_limits, pin_single_thread
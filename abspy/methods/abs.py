@@ -6,16 +6,19 @@ Author:
 - Jiaxin Wang (SJTU) jiaxin.wang@sjtu.edu.cn
 """
 
+import os
 import logging as log
 import numpy as np
-from copy import deepcopy
+from concurrent.futures import ThreadPoolExecutor
 from abspy.tools.icy_decorator import icy
+from abspy.tools.mem_tracer import memtracer
+from abspy.tools.blas_threads import blas_limits
 
 
 @icy
 class abssep(object):
     
-    def __init__(self, signal, noise=None, sigma=None, bins=None, modes=None, shift=10.0, threshold=1.0):
+    def __init__(self, signal, noise=None, sigma=None, bins=None, modes=None, shift=10.0, threshold=1.0, split=False, lmin=None, lmax=None, memory=None, nthreads=None, nworkers=1, null=None, fsky=1.0):
         """
         ABS separator class initialization function.
         
@@ -27,6 +30,9 @@ class abssep(object):
             with global size (N_modes, N_freq, N_freq).
             * N_freq: number of frequency bands
             * N_modes: number of angular modes
+            In split mode, the CROSS power-spectra between independent data splits,
+            with global size (N_pairs, N_modes, N_freq, N_freq).
+            * N_pairs: number of split pairs
             
         noise : numpy.ndarray
             The ensemble averaged (instrumental) noise CROSS power-sepctrum,
@@ -52,20 +58,80 @@ class abssep(object):
             
         threshold : (positive) float
             The threshold of signal to noise ratio, for information extraction.
+            
+        split : bool
+            If True, the signal is given as split-cross power-spectra,
+            which carry no noise bias, so the noise input is not allowed,
+            and the noise RMS is estimated from the null spectra
+            unless given explicitly.
+            
+        lmin, lmax : (positive) float
+            The window of angular modes [lmin, lmax] in use,
+            modes outside are neither copied nor binned.
+            
+        memory : (positive) float
+            Memory budget in MB, under which spectra are processed in chunks,
+            and peak usage of each stage is reported.
+            
+        null : numpy.ndarray
+            In split mode, CROSS power-spectra of the signal-free null maps of splits,
+            as given by pstimator.split_*, with global size (N_null, N_modes, N_freq, N_freq).
+            * N_null: number of null maps, N_split-1
+            Each is a realization of the full data noise,
+            hence their mean estimates the noise AUTO power-spectrum N_l,
+            and its Gaussian RMS N_l*sqrt(2/(fsky*(2l+1))) the noise RMS of AUTO power-spectrum,
+            which holds with a single null map (two splits).
+            
+        fsky : (positive) float
+            Observed sky fraction, for the Gaussian noise RMS from null spectra in split mode.
+            
+        nthreads : (positive) integer
+            Number of BLAS/LAPACK threads during eigensolves,
+            left to the BLAS library if None with a single worker,
+            or shared out as (number of cores)//nworkers if None with more workers,
+            set 1 (with nworkers 1) for running inside process pools.
+            
+        nworkers : (positive) integer
+            Number of threads solving batches of bins concurrently,
+            where LAPACK releases the GIL.
         """
         log.debug('@ abs::__init__')
         #
+        self.memory = memory
+        self.nworkers = nworkers
+        self.nthreads = nthreads
+        self.split = split
+        self.fsky = fsky
+        self.lmin = lmin
+        self.lmax = lmax
+        if self._split:
+            assert (noise is None)  # split-cross PS is free of noise bias
+            # reduce split pairs only within the window
+            _modes = [*range(signal.shape[1])] if modes is None else modes
+            _lbegin, _lend = self.lwindow(_modes)
+            if null is not None:
+                null = null[:, _lbegin:_lend]
+            modes = list(_modes[_lbegin:_lend])
+            signal, _split_sigma = self.splitcps(signal[:, _lbegin:_lend], null, modes)
+            if sigma is None:
+                sigma = _split_sigma
+            else:
+                sigma = sigma[_lbegin:_lend]
+        else:
+            assert (null is None)
         self.signal = signal
         self.noise = noise
         self.sigma = sigma
         # DO NOT CHENGE ORDER HERE
         self.modes = modes
+        self._lbegin, self._lend = self.lwindow()
         self.bins = bins
         #
         self.shift = shift
         self.threshold = threshold
         #
-        self.noise_flag = not (self._noise is None or self._sigma is None)
+        self.noise_flag = not ((self._noise is None and not self._split) or self._sigma is None)
+        self._batch = self.batching()
         
     @property
     def signal(self):
@@ -83,6 +149,14 @@ class abssep(object):
     def modes(self):
         return self._modes
         
+    @property
+    def lmin(self):
+        return self._lmin
+    
+    @property
+    def lmax(self):
+        return self._lmax
+        
     @property
     def bins(self):
         return self._bins
@@ -99,6 +173,34 @@ class abssep(object):
     def noise_flag(self):
         return self._noise_flag
         
+    @property
+    def split(self):
+        return self._split
+        
+    @property
+    def fsky(self):
+        return self._fsky
+        
+    @property
+    def memory(self):
+        return self._tracer.budget
+        
+    @property
+    def nthreads(self):
+        return self._nthreads
+        
+    @property
+    def nworkers(self):
+        return self._nworkers
+        
+    @property
+    def batch(self):
+        return self._batch
+        
+    @property
+    def report(self):
+        return self._tracer.report
+        
     @signal.setter
     def signal(self, signal):
         assert isinstance(signal, np.ndarray)
@@ -140,10 +242,25 @@ class abssep(object):
             self._modes = [*range(self._lsize)]
         log.debug('angular modes list set as '+str(self._modes))
         
+    @lmin.setter
+    def lmin(self, lmin):
+        if lmin is not None:
+            assert isinstance(lmin, (int,float))
+        self._lmin = lmin
+        log.debug('angular modes lower limit set as '+str(self._lmin))
+        
+    @lmax.setter
+    def lmax(self, lmax):
+        if lmax is not None:
+            assert isinstance(lmax, (int,float))
+            assert (self._lmin is None or lmax >= self._lmin)
+        self._lmax = lmax
+        log.debug('angular modes upper limit set as '+str(self._lmax))
+        
     @bins.setter
     def bins(self, bins):
         assert isinstance(bins, int)
-        assert (bins > 0 and bins <= self._lsize)
+        assert (bins > 0 and bins <= self._lend-self._lbegin)
         self._bins = bins
         log.debug('angular mode bin width set as '+str(self._bins))
         
@@ -167,6 +284,40 @@ class abssep(object):
         self._noise_flag = noise_flag
         log.debug('ABS with noise? '+str(self._noise_flag))
         
+    @split.setter
+    def split(self, split):
+        assert isinstance(split, bool)
+        self._split = split
+        log.debug('ABS with split-cross PS? '+str(self._split))
+        
+    @fsky.setter
+    def fsky(self, fsky):
+        assert isinstance(fsky, float)
+        assert (fsky > 0 and fsky <= 1)
+        self._fsky = fsky
+        log.debug('sky fraction set as '+str(self._fsky))
+        
+    @memory.setter
+    def memory(self, memory):
+        self._tracer = memtracer(memory)
+        
+    @nthreads.setter
+    def nthreads(self, nthreads):
+        if nthreads is None and self._nworkers > 1:  # avoid oversubscribing cores
+            nthreads = max(1, (os.cpu_count() or 1)//self._nworkers)
+        if nthreads is not None:
+            assert isinstance(nthreads, int)
+            assert (nthreads > 0)
+        self._nthreads = nthreads
+        log.debug('BLAS threads set as '+str(self._nthreads))
+        
+    @nworkers.setter
+    def nworkers(self, nworkers):
+        assert isinstance(nworkers, int)
+        assert (nworkers > 0)
+        self._nworkers = nworkers
+        log.debug('worker threads set as '+str(self._nworkers))
+        
     @property
     def binell(self):
         """
@@ -179,16 +330,146 @@ class abssep(object):
         """
         log.debug('@ abs::binell')
         _lnew = list()
-        _lres = self._lsize%self._bins
-        _lmod = self._lsize//self._bins
+        _modes = self._modes[self._lbegin:self._lend]
+        _lres = len(_modes)%self._bins
+        _lmod = len(_modes)//self._bins
         # binned average for each single spectrum
         for i in range(self._bins):
             _begin = min(_lres,i)+i*_lmod
             _end = min(_lres,i) + (i+1)*_lmod + int(i < _lres)
-            _lnew.append(0.5*(self._modes[_begin]+self._modes[_end-1]))
+            _lnew.append(0.5*(_modes[_begin]+_modes[_end-1]))
         return _lnew
+        
+    def lwindow(self, modes=None):
+        """
+        Index range of angular modes within the window [lmin, lmax],
+        where the angular modes are assumed in ascending order.
+        
+        Parameters
+        ----------
+        
+        modes : list, tuple
+            angular modes, the modes in use if None
+        
+        Returns
+        -------
+        
+        first and last (exclusive) index of angular modes in the window : (int, int)
+        """
+        log.debug('@ abs::lwindow')
+        if modes is None:
+            modes = self._modes
+        _idx = [i for i, l in enumerate(modes)
+                if (self._lmin is None or l >= self._lmin) and (self._lmax is None or l <= self._lmax)]
+        assert (len(_idx) > 0)
+        assert (_idx[-1]-_idx[0]+1 == len(_idx))  # contiguous window
+        return _idx[0], _idx[-1]+1
 
-    def bincps(self, cps):
+    def splitcps(self, scps, null=None, modes=None):
+        """
+        Reduce split-cross power-spectra into the noise-debiased CROSS power-spectrum,
+        and null spectra into the noise RMS of AUTO power-spectrum,
+        as the Gaussian RMS N_l*sqrt(2/(fsky*(2l+1))) of their mean N_l,
+        rather than their scatter, which is biased low with few null maps.
+        
+        Parameters
+        ----------
+        
+        scps : numpy.ndarray
+            split-cross power spectra, with global size (N_pairs, N_modes, N_freq, N_freq)
+            
+        null : numpy.ndarray
+            null map power spectra, with global size (N_null, N_modes, N_freq, N_freq)
+            
+        modes : list, tuple
+            angular modes of given power spectra, starting with 0 by default
+            
+        Returns
+        -------
+        
+        CROSS-PS averaged over split pairs, RMS of AUTO-PS from null maps (None without null spectra) : (numpy.ndarray, numpy.ndarray)
+        """
+        log.debug('@ abs::splitcps')
+        assert isinstance(scps, np.ndarray)
+        assert (len(scps.shape) == 4)
+        assert (scps.shape[2] == scps.shape[3])
+        _cps = np.empty(scps.shape[1:])
+        _aps = None
+        _temp = 0  # RMS temporaries of each mode
+        if null is not None:
+            assert isinstance(null, np.ndarray)
+            assert (null.shape[0] > 0)
+            assert (null.shape[1:] == scps.shape[1:])
+            if modes is None:
+                modes = [*range(scps.shape[1])]
+            assert (len(modes) == scps.shape[1])
+            _aps = np.empty(scps.shape[1:3])
+            _temp = null.shape[0]*null.shape[2]*null.itemsize
+        # angular modes per chunk
+        _chunk = scps.shape[1]
+        if self.memory is not None and _temp > 0:
+            _free = self.memory*2**20 - scps.nbytes - null.nbytes - _cps.nbytes - _aps.nbytes
+            _chunk = int(min(max(_free//_temp, 1), _chunk))
+        with self._tracer.stage('split'):
+            for _begin in range(0, scps.shape[1], _chunk):
+                _end = min(_begin+_chunk, scps.shape[1])
+                _cps[_begin:_end] = np.mean(scps[:,_begin:_end], axis=0)
+                if null is not None:
+                    _ell = np.array(modes[_begin:_end], dtype=np.float64)
+                    _aps[_begin:_end] = np.mean(np.diagonal(null[:,_begin:_end], axis1=2, axis2=3), axis=0)
+                    _aps[_begin:_end] *= np.sqrt(2.0/(self._fsky*(2.0*_ell+1.0)))[:,None]
+        return _cps, _aps
+        
+    def footprint(self, batch=None):
+        """
+        Estimated memory footprint of the separation,
+        including the resident spectra and working arrays of one batch of bins.
+        
+        Parameters
+        ----------
+        
+        batch : (positive) integer
+            number of bins per batch, the current batch size by default
+            
+        Returns
+        -------
+        
+        memory footprint in bytes : int
+        """
+        log.debug('@ abs::footprint')
+        if batch is None:
+            batch = self._batch
+        _resident = self._signal.nbytes
+        if self._noise is not None:
+            _resident += self._noise.nbytes
+        if self._sigma is not None:
+            _resident += self._sigma.nbytes
+        _output = self._bins*2*8
+        # binned and normalized Dl, complex eigen values and vectors
+        _working = batch*self._fsize*(self._fsize*(3*8+16)+16)
+        return _resident + _output + _working
+        
+    def batching(self):
+        """
+        Number of bins per batch, the most that fits in the memory budget
+        with all worker threads busy, and no more than an even share of bins per worker.
+        
+        Returns
+        -------
+        
+        number of bins per batch : int
+        """
+        log.debug('@ abs::batching')
+        _share = -(-self._bins//self._nworkers)
+        if self.memory is None:
+            return _share
+        _fixed = self.footprint(0)
+        _perbin = self.footprint(1) - _fixed
+        if not self._tracer.fits(_fixed + _perbin*self._nworkers):
+            log.warning('memory budget '+str(self.memory)+' MB below estimated footprint '+str((_fixed+_perbin*self._nworkers)/2**20)+' MB')
+        return int(min(max((self.memory*2**20 - _fixed)//(_perbin*self._nworkers), 1), _share))
+        
+    def bincps(self, cps, ibins=None):
         """
         Binned average of CROSS-power-spectrum and convert it into CROSS-Dl (band power).
         
@@ -198,6 +479,9 @@ class abssep(object):
         cps : numpy.ndarray
             cross power spectrum
             
+        ibins : list, tuple, range
+            indices of bins in use, all bins by default
+            
         Returns
         -------
             
@@ -208,20 +492,23 @@ class abssep(object):
         assert (cps.shape[0] == self._lsize)
         assert (cps.shape[1] == self._fsize)
         assert (cps.shape[1] == cps.shape[2])
-        _lres = self._lsize%self._bins
-        _lmod = self._lsize//self._bins
-        _result = np.empty((self._bins, self._fsize, self._fsize))
-        _cps = deepcopy(cps)  # avoid mem issue
+        _modes = self._modes[self._lbegin:self._lend]
+        _lres = len(_modes)%self._bins
+        _lmod = len(_modes)//self._bins
+        if ibins is None:
+            ibins = range(self._bins)
+        _result = np.empty((len(ibins), self._fsize, self._fsize))
+        _cps = cps[self._lbegin:self._lend]  # view, no copy
         # binned average for each single spectrum
-        for i in range(self._bins):
+        for k, i in enumerate(ibins):
             _begin = min(_lres,i)+i*_lmod
             _end = min(_lres,i) + (i+1)*_lmod + int(i < _lres)
             # convert Cl into Dl for each single spectrum
-            _effl = 0.5*(self._modes[_begin]+self._modes[_end-1])
-            _result[i,:,:] = np.mean(_cps[_begin:_end,:,:], axis=0)*0.5*_effl*(_effl+1)/np.pi
+            _effl = 0.5*(_modes[_begin]+_modes[_end-1])
+            _result[k,:,:] = np.mean(_cps[_begin:_end,:,:], axis=0)*0.5*_effl*(_effl+1)/np.pi
         return _result
     
-    def binaps(self, aps):
+    def binaps(self, aps, ibins=None):
         """
         Binned average of AUTO-power-spectrum Cl and convert it into AUTO-Dl (band power).
         
@@ -230,6 +517,9 @@ class abssep(object):
         
         aps : numpy.ndarray
             auto power spectrum
+            
+        ibins : list, tuple, range
+            indices of bins in use, all bins by default
         
         Returns
         -------
@@ -240,18 +530,21 @@ class abssep(object):
         assert isinstance(aps, np.ndarray)
         assert (aps.shape[0] == self._lsize)
         assert (aps.shape[1] == self._fsize)
-        _lres = self._lsize%self._bins
-        _lmod = self._lsize//self._bins
+        _modes = self._modes[self._lbegin:self._lend]
+        _lres = len(_modes)%self._bins
+        _lmod = len(_modes)//self._bins
         # allocate results
-        _result = np.empty((self._bins, self._fsize))
-        _aps = deepcopy(aps)
+        if ibins is None:
+            ibins = range(self._bins)
+        _result = np.empty((len(ibins), self._fsize))
+        _aps = aps[self._lbegin:self._lend]  # view, no copy
         # binned average for each single spectrum
-        for i in range(self._bins):
+        for k, i in enumerate(ibins):
             _begin = min(_lres,i)+i*_lmod
             _end = min(_lres,i) + (i+1)*_lmod + int(i < _lres)
-            _effl = 0.5*(self._modes[_begin]+self._modes[_end-1])
+            _effl = 0.5*(_modes[_begin]+_modes[_end-1])
             # convert Cl into Dl for each single spectrum
-            _result[i,:] = np.mean(_aps[_begin:_end,:], axis=0)*0.5*_effl*(_effl+1)/np.pi
+            _result[k,:] = np.mean(_aps[_begin:_end,:], axis=0)*0.5*_effl*(_effl+1)/np.pi
         return _result
     
     def __call__(self):
@@ -267,17 +560,46 @@ class abssep(object):
         angular modes, target angular power spectrum : (list, list)
         """
         log.debug('@ abs::run')
+        _batches = [range(_begin, min(_begin+self._batch, self._bins)) for _begin in range(0, self._bins, self._batch)]
+        _Dbl = list()
+        with self._tracer.stage('run'), blas_limits(self._nthreads):
+            if self._nworkers > 1:
+                with ThreadPoolExecutor(max_workers=self._nworkers) as _pool:
+                    for _res in _pool.map(self.runbins, _batches):
+                        _Dbl += _res
+            else:
+                for _ibins in _batches:
+                    _Dbl += self.runbins(_ibins)
+        return (self.binell, _Dbl)
+        
+    def runbins(self, ibins):
+        """
+        ABS separation on a batch of bins.
+        
+        Parameters
+        ----------
+        
+        ibins : list, tuple, range
+            indices of bins in use
+        
+        Returns
+        -------
+        target angular power spectrum : list
+        """
+        log.debug('@ abs::runbins')
+        _binell = self.binell
+        _ell = [_binell[i] for i in ibins]
         # binned average, converted to band power
-        _Dl = self.bincps(self._signal)
+        _Dl = self.bincps(self._signal, ibins)
         if (self._noise_flag):
-            _nDl = self.bincps(self._noise)
-            _nrmsDl = self.binaps(self._sigma)
+            _nrmsDl = self.binaps(self._sigma, ibins)
         # prepare CMB f(ell, freq)
-        _f = np.ones((self._bins,self._fsize), dtype=np.float64)
+        _f = np.ones((len(ibins),self._fsize), dtype=np.float64)
         if (self._noise_flag):
             _f /= _nrmsDl  # rescal f according to noise RMS
             # Dl_ij = Dl_ij/sqrt(sigma_li,sigma_lj) + shift*f_li*f_lj
-            _Dl -= _nDl
+            if not self._split:  # split-cross PS is free of noise bias
+                _Dl -= self.bincps(self._noise, ibins)
             for i in range(self._fsize):
                 for j in range(self._fsize):
                     _Dl[:,i,j] = _Dl[:,i,j]/np.sqrt(_nrmsDl[:,i]*_nrmsDl[:,j]) + self._shift*_f[:,i]*_f[:,j]
@@ -286,13 +608,16 @@ class abssep(object):
             for i in range(self._fsize):
                 for j in range(self._fsize):
                     _Dl[:,i,j] += self._shift*_f[:,i]*_f[:,j]
-        # find eign at each angular mode
+        # find eign at each angular mode, in one LAPACK call for the batch
+        # eigvecs[ell][:,i] corresponds to eigvals[ell][i]
+        # note that eigen values may be complex
+        eigvals, eigvecs = np.linalg.eig(_Dl)
         _Dbl = list()
-        for ell in range(self._bins):
-            # eigvec[:,i] corresponds to eigval[i]
-            # note that eigen values may be complex
-            eigval, eigvec = np.linalg.eig(_Dl[ell])
-            log.debug('@ abs::__call__, angular mode '+str(self.binell[ell])+' with eigen vals '+str(eigval))
+        for ell in range(len(ibins)):
+            eigval, eigvec = eigvals[ell], eigvecs[ell]
+            if not np.any(eigval.imag):  # real as solved alone, batch may be complex
+                eigval, eigvec = eigval.real, eigvec.real
+            log.debug('@ abs::__call__, angular mode '+str(_ell[ell])+' with eigen vals '+str(eigval))
             for i in range(self._fsize):
                 eigvec[:,i] /= np.linalg.norm(eigvec[:,i])**2
             _tmp = 0
@@ -301,5 +626,5 @@ class abssep(object):
                     _G = np.dot(_f[ell], eigvec[:,i])
                     _tmp += (_G**2/eigval[i])
             _Dbl.append(1.0/_tmp - self._shift)
-        return (self.binell, _Dbl)
+        return _Dbl
         
@@ -0,0 +1,67 @@
+"""
+The BLAS/LAPACK threading control module,
+by default it requires the threadpoolctl package,
+without which thread counts are left to the BLAS library,
+with a warning once per process.
+"""
+import os
+import sys
+import logging as log
+from contextlib import contextmanager
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+# warnings already issued in this process
+_warned = set()
+
+
+def _warn_once(message):
+    """
+    Issue a warning only once per process.
+    """
+    if message not in _warned:
+        _warned.add(message)
+        log.warning(message)
+
+
+@contextmanager
+def blas_limits(nthreads=None):
+    """
+    Limit the number of BLAS/LAPACK threads within the context.
+
+    Parameters
+    ----------
+
+    nthreads : (positive) integer
+        number of BLAS threads, unlimited if None
+    """
+    if nthreads is None:
+        yield
+    elif threadpool_limits is None:
+        _warn_once('threadpoolctl not found, BLAS threads not limited')
+        yield
+    else:
+        with threadpool_limits(limits=nthreads, user_api='blas'):
+            yield
+
+
+def pin_single_thread():
+    """
+    Pin BLAS/LAPACK to a single thread for the whole process,
+    designed as the initializer of process pool workers,
+    so that process-level parallelism does not oversubscribe cores.
+    Environment variables take effect for BLAS libraries not yet loaded,
+    threadpoolctl for those already loaded (e.g. by numpy),
+    without which those are left unpinned, with a warning once per process.
+    """
+    for _var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                 'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+        os.environ[_var] = '1'
+    if threadpool_limits is not None:
+        threadpool_limits(limits=1, user_api='blas')
+    elif 'numpy' in sys.modules:
+        _warn_once('threadpoolctl not found, BLAS loaded by numpy not pinned to single thread')
+        return
+    log.debug('BLAS pinned to single thread')
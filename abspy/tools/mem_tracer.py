@@ -0,0 +1,201 @@
+"""
+The memory budget and accounting module.
+
+Peak usage of each stage is measured with tracemalloc,
+which covers numpy arrays but not buffers allocated inside C extensions
+(e.g. NaMaster fields and workspaces),
+hence the resident size of the process is reported along with it,
+as the peak above stage entry where the high water mark can be reset (Linux),
+or as the change over the stage otherwise.
+"""
+import os
+import sys
+import tracemalloc
+import logging as log
+from contextlib import contextmanager
+from functools import wraps
+from abspy.tools.icy_decorator import icy
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# stack of open stages, shared by all tracers,
+# as [heap peak, resident peak] in bytes seen by each stage so far
+_frames = list()
+
+
+def _rss():
+    """
+    Current resident size in bytes, None if not available.
+    """
+    try:
+        with open('/proc/self/statm') as _f:
+            return int(_f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _hwm():
+    """
+    Peak resident size (high water mark) in bytes, None if not available.
+    """
+    try:
+        with open('/proc/self/status') as _f:
+            for _line in _f:
+                if _line.startswith('VmHWM:'):
+                    return int(_line.split()[1])*2**10
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _reset_hwm():
+    """
+    Reset the peak resident size to the current one, if allowed (Linux).
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as _f:
+            _f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _maxrss():
+    """
+    Peak resident size of the process lifetime in MB, None if not available.
+    """
+    if resource is None:
+        return None
+    _unit = 1 if sys.platform == 'darwin' else 2**10  # bytes on macOS, KB elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*_unit/2**20
+
+
+@icy
+class memtracer(object):
+
+    def __init__(self, budget=None):
+        """
+        Memory tracer class initialization function.
+
+        Parameters:
+        -----------
+
+        budget : (positive) float
+            Memory budget in MB, unlimited if None,
+            peak usage is traced only with a budget given.
+        """
+        log.debug('@ memtracer::__init__')
+        self.budget = budget
+        self._report = dict()
+
+    @property
+    def budget(self):
+        return self._budget
+
+    @property
+    def report(self):
+        """
+        Memory usage of each stage in MB, as {stage : {
+        'heap_peak' : peak of traced (Python/numpy) allocations above stage entry,
+        'rss_peak' : peak resident size above stage entry, None if not measurable,
+        'rss_delta' : change of resident size over the stage, None if not measurable,
+        'process_maxrss' : peak resident size of the process lifetime}},
+        where peaks of repeated stages are the largest ones.
+        """
+        return self._report
+
+    @budget.setter
+    def budget(self, budget):
+        if budget is not None:
+            assert isinstance(budget, (int,float))
+            assert (budget > 0)
+        self._budget = budget
+        log.debug('memory budget set as '+str(self._budget)+' MB')
+
+    def fits(self, nbytes):
+        """
+        If given memory footprint fits in the budget.
+
+        Parameters
+        ----------
+
+        nbytes : (positive) integer
+            memory footprint in bytes
+
+        Returns
+        -------
+
+        fits or not : bool
+        """
+        return (self._budget is None or nbytes <= self._budget*2**20)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Trace the peak memory usage within a stage,
+        nested stages are accounted into the outer one as well.
+
+        Parameters
+        ----------
+
+        name : str
+            stage name in the report
+        """
+        if self._budget is None:
+            yield
+            return
+        _tracing = tracemalloc.is_tracing()
+        if not _tracing:
+            tracemalloc.start()
+        _heap = tracemalloc.get_traced_memory()
+        _hwm0 = _hwm()
+        if _frames:  # peaks seen by the outer stage before resetting
+            _frames[-1][0] = max(_frames[-1][0], _heap[1])
+            if _hwm0 is not None:
+                _frames[-1][1] = max(_frames[-1][1], _hwm0)
+        if hasattr(tracemalloc, 'reset_peak'):  # python 3.9+
+            tracemalloc.reset_peak()
+        _rss0 = _rss()
+        _resident = (_hwm0 is not None and _rss0 is not None and _reset_hwm())
+        _frames.append([0, 0])
+        try:
+            yield
+        finally:
+            _frame = _frames.pop()
+            _heap_peak = max(_frame[0], tracemalloc.get_traced_memory()[1])
+            if not _tracing:
+                tracemalloc.stop()
+            _hwm1 = _hwm() if _resident else None
+            _rss_peak = None
+            if _hwm1 is not None:
+                _rss_peak = max(_frame[1], _hwm1)
+            if _frames:  # propagate peaks to the outer stage
+                _frames[-1][0] = max(_frames[-1][0], _heap_peak)
+                if _rss_peak is not None:
+                    _frames[-1][1] = max(_frames[-1][1], _rss_peak)
+            _rss1 = _rss()
+            _entry = {'heap_peak': (_heap_peak-_heap[0])/2**20,
+                      'rss_peak': None if _rss_peak is None else (_rss_peak-_rss0)/2**20,
+                      'rss_delta': None if (_rss0 is None or _rss1 is None) else (_rss1-_rss0)/2**20,
+                      'process_maxrss': _maxrss()}
+            _old = self._report.get(name)
+            if _old is not None:
+                for _key in ('heap_peak', 'rss_peak'):
+                    if _old[_key] is not None and _entry[_key] is not None:
+                        _entry[_key] = max(_old[_key], _entry[_key])
+            self._report[name] = _entry
+            log.debug('stage '+name+' peak memory '+str(_entry['heap_peak'])+' MB')
+
+
+def traced(func):
+    """
+    Trace the peak memory usage of a method as a stage named after it,
+    with the memtracer instance held as "_tracer" attribute.
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with self._tracer.stage(func.__name__):
+            return func(self, *args, **kwargs)
+    return wrapper
@@ -11,14 +11,267 @@ import healpy as hp
 import numpy as np
 import logging as log
 from abspy.tools.icy_decorator import icy
+from abspy.tools.mem_tracer import memtracer, traced
+from abspy.tools.split_nulls import nullweights
+
+
+class _nmtfields(object):
+    """
+    NaMaster fields of data splits (or of their linear combinations with given weights),
+    built on access, as a list of fields of given groups of map rows (e.g. one per frequency band),
+    so that the caller decides how long they are held.
+    """
+    def __init__(self, mask, maps, groups, lmax_sht, weights=None):
+        self._mask = mask
+        self._maps = maps
+        self._groups = groups
+        self._lmax_sht = lmax_sht
+        self._weights = weights
+    
+    def __len__(self):
+        if self._weights is None:
+            return len(self._maps)
+        return len(self._weights)
+    
+    def __getitem__(self, s):
+        if self._weights is None:
+            return [nmt.NmtField(self._mask, [self._maps[s,r] for r in g], lmax_sht=self._lmax_sht) for g in self._groups]
+        return [nmt.NmtField(self._mask, [np.dot(self._weights[s], self._maps[:,r]) for r in g], lmax_sht=self._lmax_sht) for g in self._groups]
+
+
+def _pairs(units, capacity):
+    """
+    Iterate over all pairs (a,b) with a < b of split fields,
+    holding a block of at most "capacity" splits at a time,
+    and streaming each later split past the block,
+    hence each split is built once per preceding block and once in its own block.
+    
+    Parameters
+    ----------
+    
+    units : _nmtfields
+        fields of splits, built on access
+        
+    capacity : (positive) integer
+        number of splits held at a time
+        
+    Returns
+    -------
+    
+    generator of (a, b, fields of a, fields of b)
+    """
+    _n = len(units)
+    for _begin in range(0, _n, capacity):
+        _end = min(_begin+capacity, _n)
+        _block = [units[s] for s in range(_begin, _end)]
+        for i in range(len(_block)):
+            for j in range(i+1, len(_block)):
+                yield _begin+i, _begin+j, _block[i], _block[j]
+        for b in range(_end, _n):
+            _ub = units[b]
+            for i in range(len(_block)):
+                yield _begin+i, b, _block[i], _ub
+            del _ub
+        del _block
+
+
+def _master_split(units, nulls, capacity, binning):
+    """
+    MASTER estimator of split-cross PS for all pairs of splits (a,b) with a < b,
+    symmetrized between two frequency bands if given,
+    and of PS of null maps, one at a time,
+    sharing the mode-coupling matrix computed with the first pair.
+    
+    Returns
+    -------
+    
+    split-cross PS, null PS : (numpy.ndarray, numpy.ndarray)
+        with size (N_pair, N_cl, N_ell) and (N_split-1, N_cl, N_ell)
+    """
+    _w = None
+    _cl = dict()
+    for a, b, _ua, _ub in _pairs(units, capacity):
+        if _w is None:
+            _w = nmt.NmtWorkspace()
+            _w.compute_coupling_matrix(_ua[0], _ub[-1], binning)
+        _cl[(a,b)] = _w.decouple_cell(nmt.compute_coupled_cell(_ua[0], _ub[-1]))
+        if (len(_ua) == 2):
+            _cl[(a,b)] = 0.5*(_cl[(a,b)] + _w.decouple_cell(nmt.compute_coupled_cell(_ub[0], _ua[-1])))
+    _nl = list()
+    for k in range(len(nulls)):
+        _uk = nulls[k]
+        _nl.append(_w.decouple_cell(nmt.compute_coupled_cell(_uk[0], _uk[-1])))
+        del _uk
+    return np.array([_cl[p] for p in sorted(_cl)]), np.array(_nl)
+
 
 @icy
 class pstimator(object):
 
-    def __init__(self):
-        pass
+    def __init__(self, memory=None):
+        """
+        Pseudo-PS estimator class initialization function.
+        
+        Parameters:
+        -----------
+        
+        memory : (positive) float
+            Memory budget in MB, under which split fields are held in blocks,
+            and peak usage of each estimator call is reported.
+        """
+        self.memory = memory
+        
+    @property
+    def memory(self):
+        return self._tracer.budget
+        
+    @property
+    def report(self):
+        return self._tracer.report
         
-    def auto_t(self, maps, mask=None, aposcale=None, binning=None):
+    @memory.setter
+    def memory(self, memory):
+        self._tracer = memtracer(memory)
+        
+    def footprint(self, nside, nfield0=0, nfield2=0, lmax=None):
+        """
+        Estimated memory footprint of NaMaster fields and mode-coupling matrices,
+        with each field holding a copy of its maps and harmonic coefficients.
+        
+        Parameters
+        ----------
+        
+        nside : (positive) integer
+            HEALPix resolution
+            
+        nfield0, nfield2 : (positive) integer
+            number of resident scalar and spin-2 fields
+            
+        lmax : (positive) integer
+            the highest angular mode in transforms, 3*nside-1 by default
+            
+        Returns
+        -------
+        
+        memory footprint in bytes : int
+        """
+        if lmax is None:
+            lmax = 3*nside-1
+        _npix = 12*nside**2
+        _nalm = (lmax+1)*(lmax+2)//2
+        _field = _npix*8 + _nalm*16  # map copy and alm, per component
+        _result = 2*_npix*8  # mask and apodized mask
+        _result += (nfield0 + 2*nfield2)*_field
+        if nfield0 > 0:
+            _result += ((lmax+1)**2)*8  # scalar - scalar coupling
+        if nfield2 > 0:
+            _result += ((4*(lmax+1))**2)*8  # tensor - tensor coupling
+        return _result
+        
+    def _capacity(self, nside, nsplit, nfield0=0, nfield2=0, lmax=None):
+        """
+        Number of splits whose fields are held at a time under the memory budget,
+        all of them if fit, otherwise as many as fit along with one streamed split,
+        but at least one.
+        
+        Parameters
+        ----------
+        
+        nside : (positive) integer
+            HEALPix resolution
+            
+        nsplit : (positive) integer
+            number of data splits
+            
+        nfield0, nfield2 : (positive) integer
+            number of scalar and spin-2 fields of each split
+            
+        lmax : (positive) integer
+            the highest angular mode in transforms, 3*nside-1 by default
+            
+        Returns
+        -------
+        
+        number of splits : int
+        """
+        if self._tracer.fits(self.footprint(nside, nsplit*nfield0, nsplit*nfield2, lmax)):
+            return nsplit
+        _capacity = nsplit-1
+        while (_capacity > 1 and not self._tracer.fits(self.footprint(nside, (_capacity+1)*nfield0, (_capacity+1)*nfield2, lmax))):
+            _capacity -= 1
+        return _capacity
+        
+    def _lmaxsht(self, nside, aposcale, lmax=None):
+        """
+        The highest angular mode in transforms for bandpowers up to lmax,
+        extended by a margin of 2*180/aposcale modes,
+        about twice the harmonic width of the apodized mask edge (aposcale in degree),
+        so that the mode-coupling of modes beyond lmax into the top bandpowers is kept.
+        
+        Parameters
+        ----------
+        
+        nside : (positive) integer
+            HEALPix resolution
+            
+        aposcale : (positive) float
+            apodization scale in degree
+            
+        lmax : (positive) integer
+            the highest angular mode of bandpowers, 3*nside-1 by default
+            
+        Returns
+        -------
+        
+        the highest angular mode in transforms, no more than 3*nside-1 : int
+        """
+        if lmax is None:
+            return 3*nside-1
+        return int(min(lmax + 2*np.ceil(180.0/aposcale), 3*nside-1))
+        
+    def _binning(self, nside, binning=None, lmin=None, lmax=None):
+        """
+        NaMaster binning scheme with ? ells per bandpower,
+        restricted to the angular modes window [lmin, lmax].
+        
+        Parameters
+        ----------
+        
+        nside : (positive) integer
+            HEALPix resolution
+            
+        binning : (positive) integer
+            number of ells per bandpower, 16 by default
+            
+        lmin, lmax : (positive) integer
+            The angular modes window, [2, 3*nside-1] by default.
+            
+        Returns
+        -------
+        
+        binning scheme : pymaster.NmtBin
+        """
+        if binning is None:
+            binning = 16
+        else:
+            assert isinstance(binning, int)
+        if lmin is None and lmax is None:
+            return nmt.NmtBin(nside, nlb=binning)
+        if lmin is None:
+            lmin = 2
+        if lmax is None:
+            lmax = 3*nside-1
+        assert isinstance(lmin, int)
+        assert isinstance(lmax, int)
+        assert (lmin >= 0 and lmax < 3*nside and lmax-lmin+1 >= binning)
+        # incomplete last bandpower is dropped, as in NmtBin(nside, nlb)
+        _ells = np.arange(lmin, lmin+((lmax-lmin+1)//binning)*binning, dtype=np.int32)
+        _bpws = (_ells-lmin)//binning
+        _weights = np.ones(len(_ells))/binning
+        return nmt.NmtBin(nside, bpws=_bpws, ells=_ells, weights=_weights, lmax=lmax)
+        
+    @traced
+    def auto_t(self, maps, mask=None, aposcale=None, binning=None, lmin=None, lmax=None):
         """
         Auto PS,
         apply NaMaster estimator to T (scalar) map with(out) masks,
@@ -33,6 +286,12 @@ class pstimator(object):
         mask : numpy.ndarray
             mask map
             
+        lmin, lmax : (positive) integer
+            The angular modes window [lmin, lmax] of bandpowers,
+            with transforms extended beyond lmax by a margin (see _lmaxsht),
+            trading transform cost for the leakage from modes beyond lmax
+            into the top bandpowers, which MASTER would otherwise miss.
+            
         Returns
         -------
         
@@ -47,20 +306,19 @@ class pstimator(object):
         if aposcale is None:
             aposcale = 1.0
         _apd_mask = nmt.mask_apodization(mask, aposcale, apotype='Smooth')
+        # SHT beyond lmax by a margin, for leakage into the top bandpowers
+        _lmax_sht = self._lmaxsht(_nside, aposcale, lmax)
         _mapI = maps[0]
         # assemble NaMaster fields
-        _f0 = nmt.NmtField(_apd_mask, [_mapI])
+        _f0 = nmt.NmtField(_apd_mask, [_mapI], lmax_sht=_lmax_sht)
         # initialize binning scheme with ? ells per bandpower
-        if binning is None:
-            binning = 16
-        else:
-            assert isinstance(binning, int)
-        _b = nmt.NmtBin(_nside, nlb=binning)
+        _b = self._binning(_nside, binning, lmin, lmax)
         # MASTER estimator
         _cl00 = nmt.compute_full_master(_f0, _f0, _b)  # scalar - scalar
         return _b.get_effective_ells(), _cl00[0]
         
-    def cross_t(self, maps, mask=None, aposcale=None, binning=None):
+    @traced
+    def cross_t(self, maps, mask=None, aposcale=None, binning=None, lmin=None, lmax=None):
         """
         Cross PS,
         apply NaMaster estimator to T (scalar) map with(out) masks,
@@ -75,6 +333,12 @@ class pstimator(object):
         mask : numpy.ndarray
             mask map
             
+        lmin, lmax : (positive) integer
+            The angular modes window [lmin, lmax] of bandpowers,
+            with transforms extended beyond lmax by a margin (see _lmaxsht),
+            trading transform cost for the leakage from modes beyond lmax
+            into the top bandpowers, which MASTER would otherwise miss.
+            
         Returns
         -------
         
@@ -89,22 +353,21 @@ class pstimator(object):
         if aposcale is None:
             aposcale = 1.0
         _apd_mask = nmt.mask_apodization(mask, aposcale, apotype='Smooth')
+        # SHT beyond lmax by a margin, for leakage into the top bandpowers
+        _lmax_sht = self._lmaxsht(_nside, aposcale, lmax)
         _mapI01 = maps[0]
         _mapI02 = maps[1]
         # assemble NaMaster fields
-        _f01 = nmt.NmtField(_apd_mask, [_mapI01])
-        _f02 = nmt.NmtField(_apd_mask, [_mapI02])
+        _f01 = nmt.NmtField(_apd_mask, [_mapI01], lmax_sht=_lmax_sht)
+        _f02 = nmt.NmtField(_apd_mask, [_mapI02], lmax_sht=_lmax_sht)
         # initialize binning scheme with ? ells per bandpower
-        if binning is None:
-            binning = 16
-        else:
-            assert isinstance(binning, int)
-        _b = nmt.NmtBin(_nside, nlb=binning)
+        _b = self._binning(_nside, binning, lmin, lmax)
         # MASTER estimator
         _cl00 = nmt.compute_full_master(_f01, _f02, _b)  # scalar - scalar
         return _b.get_effective_ells(), _cl00[0]
     
-    def auto_eb(self, maps, mask=None, aposcale=None, binning=None):
+    @traced
+    def auto_eb(self, maps, mask=None, aposcale=None, binning=None, lmin=None, lmax=None):
         """
         Auto PS,
         apply NaMaster estimator to QU (spin-2) maps with(out) masks,
@@ -120,6 +383,12 @@ class pstimator(object):
         mask : numpy.ndarray
             mask map
             
+        lmin, lmax : (positive) integer
+            The angular modes window [lmin, lmax] of bandpowers,
+            with transforms extended beyond lmax by a margin (see _lmaxsht),
+            trading transform cost for the leakage from modes beyond lmax
+            into the top bandpowers, which MASTER would otherwise miss.
+            
         Returns
         -------
         
@@ -134,21 +403,20 @@ class pstimator(object):
         if aposcale is None:
             aposcale = 1.0
         _apd_mask = nmt.mask_apodization(mask, aposcale, apotype='Smooth')
+        # SHT beyond lmax by a margin, for leakage into the top bandpowers
+        _lmax_sht = self._lmaxsht(_nside, aposcale, lmax)
         _mapQ = maps[0]
         _mapU = maps[1]
         # assemble NaMaster fields
-        _f2 = nmt.NmtField(_apd_mask, [_mapQ, _mapU])
+        _f2 = nmt.NmtField(_apd_mask, [_mapQ, _mapU], lmax_sht=_lmax_sht)
         # initialize binning scheme with ? ells per bandpower
-        if binning is None:
-            binning = 16
-        else:
-            assert isinstance(binning, int)
-        _b = nmt.NmtBin(_nside, nlb=binning)
+        _b = self._binning(_nside, binning, lmin, lmax)
         # MASTER estimator
         _cl22 = nmt.compute_full_master(_f2, _f2, _b)  # tensor - tensor
         return _b.get_effective_ells(), _cl22[0], _cl22[3]
         
-    def cross_eb(self, maps, mask=None, aposcale=None, binning=None):
+    @traced
+    def cross_eb(self, maps, mask=None, aposcale=None, binning=None, lmin=None, lmax=None):
         """
         Cross PS,
         apply NaMaster estimator to QU (spin-2) maps with(out) masks,
@@ -164,6 +432,12 @@ class pstimator(object):
         mask : numpy.ndarray
             mask map
             
+        lmin, lmax : (positive) integer
+            The angular modes window [lmin, lmax] of bandpowers,
+            with transforms extended beyond lmax by a margin (see _lmaxsht),
+            trading transform cost for the leakage from modes beyond lmax
+            into the top bandpowers, which MASTER would otherwise miss.
+            
         Returns
         -------
         
@@ -178,24 +452,23 @@ class pstimator(object):
         if aposcale is None:
             aposcale = 1.0
         _apd_mask = nmt.mask_apodization(mask, aposcale, apotype='Smooth')
+        # SHT beyond lmax by a margin, for leakage into the top bandpowers
+        _lmax_sht = self._lmaxsht(_nside, aposcale, lmax)
         _mapQ01 = maps[0]
         _mapU01 = maps[1]
         _mapQ02 = maps[2]
         _mapU02 = maps[3]
         # assemble NaMaster fields
-        _f21 = nmt.NmtField(_apd_mask, [_mapQ01, _mapU01])
-        _f22 = nmt.NmtField(_apd_mask, [_mapQ02, _mapU02])
+        _f21 = nmt.NmtField(_apd_mask, [_mapQ01, _mapU01], lmax_sht=_lmax_sht)
+        _f22 = nmt.NmtField(_apd_mask, [_mapQ02, _mapU02], lmax_sht=_lmax_sht)
         # initialize binning scheme with ? ells per bandpower
-        if binning is None:
-            binning = 16
-        else:
-            assert isinstance(binning, int)
-        _b = nmt.NmtBin(_nside, nlb=binning)
+        _b = self._binning(_nside, binning, lmin, lmax)
         # MASTER estimator
         _cl22 = nmt.compute_full_master(_f21, _f22, _b)  # tensor - tensor
         return _b.get_effective_ells(), _cl22[0], _cl22[3]
     
-    def auto_teb(self, maps, mask=None, aposcale=None, binning=None):
+    @traced
+    def auto_teb(self, maps, mask=None, aposcale=None, binning=None, lmin=None, lmax=None):
         """
         Auto PS,
         apply NaMaster estimator to TQU maps with(out) masks,
@@ -211,6 +484,12 @@ class pstimator(object):
         mask : numpy.ndarray
             mask map
             
+        lmin, lmax : (positive) integer
+            The angular modes window [lmin, lmax] of bandpowers,
+            with transforms extended beyond lmax by a margin (see _lmaxsht),
+            trading transform cost for the leakage from modes beyond lmax
+            into the top bandpowers, which MASTER would otherwise miss.
+            
         Returns
         -------
         
@@ -225,24 +504,24 @@ class pstimator(object):
         if aposcale is None:
             aposcale = 1.0
         _apd_mask = nmt.mask_apodization(mask, aposcale, apotype='Smooth')
+        # SHT beyond lmax by a margin, for leakage into the top bandpowers
+        _lmax_sht = self._lmaxsht(_nside, aposcale, lmax)
         _mapI = maps[0]
         _mapQ = maps[1]
         _mapU = maps[2]
-        # assemble NaMaster fields
-        _f0 = nmt.NmtField(_apd_mask, [_mapI])
-        _f2 = nmt.NmtField(_apd_mask, [_mapQ, _mapU])
         # initialize binning scheme with ? ells per bandpower
-        if binning is None:
-            binning = 16
-        else:
-            assert isinstance(binning, int)
-        _b = nmt.NmtBin(_nside, nlb=binning)
-        # MASTER estimator
+        _b = self._binning(_nside, binning, lmin, lmax)
+        # assemble NaMaster fields and apply MASTER estimator,
+        # scalar fields are freed before assembling tensor fields
+        _f0 = nmt.NmtField(_apd_mask, [_mapI], lmax_sht=_lmax_sht)
         _cl00 = nmt.compute_full_master(_f0, _f0, _b)  # scalar - scalar
+        del _f0
+        _f2 = nmt.NmtField(_apd_mask, [_mapQ, _mapU], lmax_sht=_lmax_sht)
         _cl22 = nmt.compute_full_master(_f2, _f2, _b)  # tensor - tensor
         return _b.get_effective_ells(), _cl00[0], _cl22[0], _cl22[3]
         
-    def cross_teb(self, maps, mask=None, aposcale=None, binning=None):
+    @traced
+    def cross_teb(self, maps, mask=None, aposcale=None, binning=None, lmin=None, lmax=None):
         """
         Cross PS,
         apply NaMaster estimator to TQU maps with(out) masks,
@@ -258,6 +537,12 @@ class pstimator(object):
         mask : numpy.ndarray
             mask map
             
+        lmin, lmax : (positive) integer
+            The angular modes window [lmin, lmax] of bandpowers,
+            with transforms extended beyond lmax by a margin (see _lmaxsht),
+            trading transform cost for the leakage from modes beyond lmax
+            into the top bandpowers, which MASTER would otherwise miss.
+            
         Returns
         -------
         
@@ -272,24 +557,211 @@ class pstimator(object):
         if aposcale is None:
             aposcale = 1.0
         _apd_mask = nmt.mask_apodization(mask, aposcale, apotype='Smooth')
+        # SHT beyond lmax by a margin, for leakage into the top bandpowers
+        _lmax_sht = self._lmaxsht(_nside, aposcale, lmax)
         _mapI01 = maps[0]
         _mapQ01 = maps[1]
         _mapU01 = maps[2]
         _mapI02 = maps[3]
         _mapQ02 = maps[4]
         _mapU02 = maps[5]
-        # assemble NaMaster fields
-        _f01 = nmt.NmtField(_apd_mask, [_mapI01])
-        _f21 = nmt.NmtField(_apd_mask, [_mapQ01, _mapU01])
-        _f02 = nmt.NmtField(_apd_mask, [_mapI02])
-        _f22 = nmt.NmtField(_apd_mask, [_mapQ02, _mapU02])
         # initialize binning scheme with ? ells per bandpower
-        if binning is None:
-            binning = 16
-        else:
-            assert isinstance(binning, int)
-        _b = nmt.NmtBin(_nside, nlb=binning)
-        # MASTER estimator
+        _b = self._binning(_nside, binning, lmin, lmax)
+        # assemble NaMaster fields and apply MASTER estimator,
+        # scalar fields are freed before assembling tensor fields
+        _f01 = nmt.NmtField(_apd_mask, [_mapI01], lmax_sht=_lmax_sht)
+        _f02 = nmt.NmtField(_apd_mask, [_mapI02], lmax_sht=_lmax_sht)
         _cl00 = nmt.compute_full_master(_f01, _f02, _b)  # scalar - scalar
+        del _f01, _f02
+        _f21 = nmt.NmtField(_apd_mask, [_mapQ01, _mapU01], lmax_sht=_lmax_sht)
+        _f22 = nmt.NmtField(_apd_mask, [_mapQ02, _mapU02], lmax_sht=_lmax_sht)
         _cl22 = nmt.compute_full_master(_f21, _f22, _b)  # tensor - tensor
         return _b.get_effective_ells(), _cl00[0], _cl22[0], _cl22[3]
+    
+    @traced
+    def split_t(self, maps, mask=None, aposcale=None, binning=None, lmin=None, lmax=None):
+        """
+        Split-cross PS,
+        apply NaMaster estimator to T (scalar) maps of independent data splits with(out) masks,
+        requires NaMaster, healpy, numpy packages.
+        
+        Cross-spectra are estimated only between different splits,
+        hence free of noise bias, for each pair of splits (a,b) with a < b,
+        along with PS of the N_split-1 signal-free null maps (see split_nulls),
+        each a realization of the full data noise, for estimating the noise RMS,
+        by sharing the mode-coupling matrix among all pairs.
+        Under a memory budget too small for all split fields, as many as fit are held at a time,
+        and the other splits are streamed past them.
+        
+        Parameters
+        ----------
+        
+        maps : numpy.ndarray
+            A (N_split, 1, N_pix) array of T maps of one frequency band,
+            or a (N_split, 2, N_pix) array of T maps of two frequency bands, arranged as {T1,T2},
+            in which case the split-cross PS is symmetrized as 0.5*(T1a*T2b + T1b*T2a).
+            
+        mask : numpy.ndarray
+            mask map
+            
+        lmin, lmax : (positive) integer
+            The angular modes window [lmin, lmax] of bandpowers,
+            with transforms extended beyond lmax by a margin (see _lmaxsht),
+            trading transform cost for the leakage from modes beyond lmax
+            into the top bandpowers, which MASTER would otherwise miss.
+            
+        Returns
+        -------
+        
+        pseudo-PS results : tuple of numpy.ndarray
+            (ell, TT, null TT), each PS with size (N_pair, N_ell), null PS with size (N_split-1, N_ell)
+        """
+        assert isinstance(maps, np.ndarray)
+        assert (maps.shape[0] > 1)
+        assert (maps.shape[1] in (1, 2))
+        # fix resolution and apodization
+        _nside = hp.get_nside(maps[0,0])
+        # apodization
+        if aposcale is None:
+            aposcale = 1.0
+        _apd_mask = nmt.mask_apodization(mask, aposcale, apotype='Smooth')
+        # SHT beyond lmax by a margin, for leakage into the top bandpowers
+        _lmax_sht = self._lmaxsht(_nside, aposcale, lmax)
+        # assemble NaMaster fields of each band, held in blocks of splits fit in memory budget
+        _groups = [[r] for r in range(maps.shape[1])]
+        _units = _nmtfields(_apd_mask, maps, _groups, _lmax_sht)
+        _nulls = _nmtfields(_apd_mask, maps, _groups, _lmax_sht, nullweights(len(maps)))
+        _capacity = self._capacity(_nside, len(maps), nfield0=maps.shape[1], lmax=_lmax_sht)
+        # initialize binning scheme with ? ells per bandpower
+        _b = self._binning(_nside, binning, lmin, lmax)
+        # MASTER estimator, mode-coupling matrix shared by all split pairs
+        _cl00, _nl00 = _master_split(_units, _nulls, _capacity, _b)  # scalar - scalar
+        return _b.get_effective_ells(), _cl00[:,0], _nl00[:,0]
+    
+    @traced
+    def split_eb(self, maps, mask=None, aposcale=None, binning=None, lmin=None, lmax=None):
+        """
+        Split-cross PS,
+        apply NaMaster estimator to QU (spin-2) maps of independent data splits with(out) masks,
+        requires NaMaster, healpy, numpy packages.
+        
+        Cross-spectra are estimated only between different splits,
+        hence free of noise bias, for each pair of splits (a,b) with a < b,
+        along with PS of the N_split-1 signal-free null maps (see split_nulls),
+        each a realization of the full data noise, for estimating the noise RMS,
+        by sharing the mode-coupling matrix among all pairs.
+        Under a memory budget too small for all split fields, as many as fit are held at a time,
+        and the other splits are streamed past them.
+        
+        Parameters
+        ----------
+        
+        maps : numpy.ndarray
+            A (N_split, 2, N_pix) array of Q, U maps of one frequency band,
+            or a (N_split, 4, N_pix) array of Q, U maps of two frequency bands, arranged as {Q1,U1,Q2,U2},
+            in which case the split-cross PS is symmetrized as 0.5*(P1a*P2b + P1b*P2a),
+            with polarization in CMB convention.
+            
+        mask : numpy.ndarray
+            mask map
+            
+        lmin, lmax : (positive) integer
+            The angular modes window [lmin, lmax] of bandpowers,
+            with transforms extended beyond lmax by a margin (see _lmaxsht),
+            trading transform cost for the leakage from modes beyond lmax
+            into the top bandpowers, which MASTER would otherwise miss.
+            
+        Returns
+        -------
+        
+        pseudo-PS results : tuple of numpy.ndarray
+            (ell, EE, BB, null EE, null BB), each PS with size (N_pair, N_ell), null PS with size (N_split-1, N_ell)
+        """
+        assert isinstance(maps, np.ndarray)
+        assert (maps.shape[0] > 1)
+        assert (maps.shape[1] in (2, 4))
+        # fix resolution and apodization
+        _nside = hp.get_nside(maps[0,0])
+        # apodization
+        if aposcale is None:
+            aposcale = 1.0
+        _apd_mask = nmt.mask_apodization(mask, aposcale, apotype='Smooth')
+        # SHT beyond lmax by a margin, for leakage into the top bandpowers
+        _lmax_sht = self._lmaxsht(_nside, aposcale, lmax)
+        # assemble NaMaster fields of each band, held in blocks of splits fit in memory budget
+        _groups = [[r, r+1] for r in range(0, maps.shape[1], 2)]
+        _units = _nmtfields(_apd_mask, maps, _groups, _lmax_sht)
+        _nulls = _nmtfields(_apd_mask, maps, _groups, _lmax_sht, nullweights(len(maps)))
+        _capacity = self._capacity(_nside, len(maps), nfield2=maps.shape[1]//2, lmax=_lmax_sht)
+        # initialize binning scheme with ? ells per bandpower
+        _b = self._binning(_nside, binning, lmin, lmax)
+        # MASTER estimator, mode-coupling matrix shared by all split pairs
+        _cl22, _nl22 = _master_split(_units, _nulls, _capacity, _b)  # tensor - tensor
+        return _b.get_effective_ells(), _cl22[:,0], _cl22[:,3], _nl22[:,0], _nl22[:,3]
+    
+    @traced
+    def split_teb(self, maps, mask=None, aposcale=None, binning=None, lmin=None, lmax=None):
+        """
+        Split-cross PS,
+        apply NaMaster estimator to TQU maps of independent data splits with(out) masks,
+        requires NaMaster, healpy, numpy packages.
+        
+        Cross-spectra are estimated only between different splits,
+        hence free of noise bias, for each pair of splits (a,b) with a < b,
+        along with PS of the N_split-1 signal-free null maps (see split_nulls),
+        each a realization of the full data noise, for estimating the noise RMS,
+        by sharing the mode-coupling matrices among all pairs.
+        Under a memory budget too small for all split fields, as many as fit are held at a time,
+        and the other splits are streamed past them.
+        
+        Parameters
+        ----------
+        
+        maps : numpy.ndarray
+            A (N_split, 3, N_pix) array of T, Q, U maps of one frequency band,
+            or a (N_split, 6, N_pix) array of T, Q, U maps of two frequency bands, arranged as {T,Q,U,T,Q,U},
+            in which case the split-cross PS is symmetrized as 0.5*(X1a*X2b + X1b*X2a),
+            with polarization in CMB convention.
+            
+        mask : numpy.ndarray
+            mask map
+            
+        lmin, lmax : (positive) integer
+            The angular modes window [lmin, lmax] of bandpowers,
+            with transforms extended beyond lmax by a margin (see _lmaxsht),
+            trading transform cost for the leakage from modes beyond lmax
+            into the top bandpowers, which MASTER would otherwise miss.
+            
+        Returns
+        -------
+        
+        pseudo-PS results : tuple of numpy.ndarray
+            (ell, TT, EE, BB, null TT, null EE, null BB), each PS with size (N_pair, N_ell), null PS with size (N_split-1, N_ell)
+        """
+        assert isinstance(maps, np.ndarray)
+        assert (maps.shape[0] > 1)
+        assert (maps.shape[1] in (3, 6))
+        # fix resolution and apodization
+        _nside = hp.get_nside(maps[0,0])
+        # apodization
+        if aposcale is None:
+            aposcale = 1.0
+        _apd_mask = nmt.mask_apodization(mask, aposcale, apotype='Smooth')
+        # SHT beyond lmax by a margin, for leakage into the top bandpowers
+        _lmax_sht = self._lmaxsht(_nside, aposcale, lmax)
+        # initialize binning scheme with ? ells per bandpower
+        _b = self._binning(_nside, binning, lmin, lmax)
+        # assemble NaMaster fields of each band, held in blocks of splits fit in memory budget,
+        # scalar fields are freed before assembling tensor fields
+        _nband = maps.shape[1]//3
+        _groups = [[3*i] for i in range(_nband)]
+        _units = _nmtfields(_apd_mask, maps, _groups, _lmax_sht)
+        _nulls = _nmtfields(_apd_mask, maps, _groups, _lmax_sht, nullweights(len(maps)))
+        _capacity = self._capacity(_nside, len(maps), nfield0=_nband, lmax=_lmax_sht)
+        _cl00, _nl00 = _master_split(_units, _nulls, _capacity, _b)  # scalar - scalar
+        _groups = [[3*i+1, 3*i+2] for i in range(_nband)]
+        _units = _nmtfields(_apd_mask, maps, _groups, _lmax_sht)
+        _nulls = _nmtfields(_apd_mask, maps, _groups, _lmax_sht, nullweights(len(maps)))
+        _capacity = self._capacity(_nside, len(maps), nfield2=_nband, lmax=_lmax_sht)
+        _cl22, _nl22 = _master_split(_units, _nulls, _capacity, _b)  # tensor - tensor
+        return _b.get_effective_ells(), _cl00[:,0], _cl22[:,0], _cl22[:,3], _nl00[:,0], _nl22[:,0], _nl22[:,3]
@@ -0,0 +1,451 @@
+"""
+The synthetic sky simulator module,
+generating multi-frequency CMB + foreground + noise
+cross power-spectra (and maps) for tests and benchmarks.
+
+The sky model is a toy one:
+- CMB, scale-invariant band power with damping tail,
+  flat frequency scaling in CMB units;
+- thermal dust, power-law band power with modified black-body frequency scaling;
+- synchrotron, power-law band power with power-law frequency scaling;
+- instrumental noise, white with given level in each band.
+Every sky component is fully correlated among frequency bands,
+so the cross power-spectrum matrices are positive semi-definite by construction.
+"""
+import healpy as hp
+import numpy as np
+import logging as log
+from abspy.tools.icy_decorator import icy
+from abspy.tools.split_nulls import nullweights
+
+
+@icy
+class skysim(object):
+
+    def __init__(self, nside, freqs, nlevel=1.0, nsim=1, nsplit=4, fsky=1.0, lmin=2, lmax=None, cmb=1.0e+3, dust=1.0e+2, sync=1.0, seed=None):
+        """
+        Synthetic sky simulator class initialization function.
+
+        Parameters:
+        -----------
+
+        nside : (positive) integer
+            HEALPix resolution.
+
+        freqs : list, tuple
+            The list of frequency bands in GHz.
+
+        nlevel : (positive) float, list, tuple
+            White noise level in uK-arcmin, for all or each frequency band.
+
+        nsim : (positive) integer
+            Number of noise realizations.
+
+        nsplit : (positive) integer
+            Number of independent data splits.
+
+        fsky : (positive) float
+            Observed sky fraction, reduces the effective degrees of freedom per angular mode.
+
+        lmin, lmax : (positive) integer
+            The range of angular modes, [2, 3*nside-1] by default.
+
+        cmb, dust, sync : (positive) float
+            Band power amplitudes of CMB, dust at 353GHz and synchrotron at 30GHz,
+            in uK^2 (CMB units), at angular mode 80.
+
+        seed : (positive) integer
+            Random seed, same seed with same calling sequence gives same results.
+        """
+        log.debug('@ skysim::__init__')
+        #
+        self.nside = nside
+        self.freqs = freqs
+        # DO NOT CHENGE ORDER HERE
+        self.nlevel = nlevel
+        self.lmin = lmin
+        self.lmax = lmax
+        #
+        self.nsim = nsim
+        self.nsplit = nsplit
+        self.fsky = fsky
+        self.cmb = cmb
+        self.dust = dust
+        self.sync = sync
+        #
+        self._rng = np.random.RandomState(seed)
+
+    @property
+    def nside(self):
+        return self._nside
+
+    @property
+    def freqs(self):
+        return self._freqs
+
+    @property
+    def nlevel(self):
+        return self._nlevel
+
+    @property
+    def lmin(self):
+        return self._lmin
+
+    @property
+    def lmax(self):
+        return self._lmax
+
+    @property
+    def nsim(self):
+        return self._nsim
+
+    @property
+    def nsplit(self):
+        return self._nsplit
+
+    @property
+    def fsky(self):
+        return self._fsky
+
+    @property
+    def cmb(self):
+        return self._cmb
+
+    @property
+    def dust(self):
+        return self._dust
+
+    @property
+    def sync(self):
+        return self._sync
+
+    @property
+    def modes(self):
+        return [*range(self._lmin, self._lmax+1)]
+
+    @nside.setter
+    def nside(self, nside):
+        assert isinstance(nside, int)
+        assert (nside > 0)
+        self._nside = nside
+        log.debug('HEALPix Nside set as '+str(self._nside))
+
+    @freqs.setter
+    def freqs(self, freqs):
+        assert isinstance(freqs, (list,tuple))
+        assert (len(freqs) > 0)
+        self._fsize = len(freqs)
+        self._freqs = np.array(freqs, dtype=np.float64)
+        log.debug('frequency bands set as '+str(self._freqs))
+
+    @nlevel.setter
+    def nlevel(self, nlevel):
+        if isinstance(nlevel, (list,tuple)):
+            assert (len(nlevel) == self._fsize)
+            self._nlevel = np.array(nlevel, dtype=np.float64)
+        else:
+            assert isinstance(nlevel, float)
+            self._nlevel = nlevel*np.ones(self._fsize)
+        assert (np.all(self._nlevel > 0))  # keeps covariance positive definite
+        log.debug('noise level set as '+str(self._nlevel))
+
+    @lmin.setter
+    def lmin(self, lmin):
+        assert isinstance(lmin, int)
+        assert (lmin > 1)
+        self._lmin = lmin
+        log.debug('angular modes lower limit set as '+str(self._lmin))
+
+    @lmax.setter
+    def lmax(self, lmax):
+        if lmax is None:
+            lmax = 3*self._nside-1
+        assert isinstance(lmax, int)
+        assert (lmax >= self._lmin)
+        self._lmax = lmax
+        log.debug('angular modes upper limit set as '+str(self._lmax))
+
+    @nsim.setter
+    def nsim(self, nsim):
+        assert isinstance(nsim, int)
+        assert (nsim > 0)
+        self._nsim = nsim
+        log.debug('number of noise realizations set as '+str(self._nsim))
+
+    @nsplit.setter
+    def nsplit(self, nsplit):
+        assert isinstance(nsplit, int)
+        assert (nsplit > 0)
+        self._nsplit = nsplit
+        log.debug('number of data splits set as '+str(self._nsplit))
+
+    @fsky.setter
+    def fsky(self, fsky):
+        assert isinstance(fsky, float)
+        assert (fsky > 0 and fsky <= 1)
+        self._fsky = fsky
+        log.debug('sky fraction set as '+str(self._fsky))
+
+    @cmb.setter
+    def cmb(self, cmb):
+        assert isinstance(cmb, float)
+        assert (cmb >= 0)
+        self._cmb = cmb
+        log.debug('CMB amplitude set as '+str(self._cmb))
+
+    @dust.setter
+    def dust(self, dust):
+        assert isinstance(dust, float)
+        assert (dust >= 0)
+        self._dust = dust
+        log.debug('dust amplitude set as '+str(self._dust))
+
+    @sync.setter
+    def sync(self, sync):
+        assert isinstance(sync, float)
+        assert (sync >= 0)
+        self._sync = sync
+        log.debug('synchrotron amplitude set as '+str(self._sync))
+
+    def _cmbunit(self, freqs):
+        """
+        Conversion factor from Rayleigh-Jeans to CMB (thermodynamic) units.
+        """
+        _x = 0.0479924*freqs/2.7255  # h*nu/(k*T_cmb)
+        return (np.exp(_x)-1.0)**2/(_x**2*np.exp(_x))
+
+    def seds(self):
+        """
+        Frequency scaling of sky components in CMB units,
+        normalized at the reference frequencies.
+
+        Returns
+        -------
+
+        CMB, dust, synchrotron SEDs : numpy.ndarray
+            with size (3, N_freq)
+        """
+        log.debug('@ skysim::seds')
+        _beta_d, _temp_d, _beta_s = 1.54, 20.0, -3.0
+        _mbb = lambda nu: nu**(_beta_d+1.0)/(np.exp(0.0479924*nu/_temp_d)-1.0)
+        _dsed = _mbb(self._freqs)/_mbb(353.0)*self._cmbunit(self._freqs)/self._cmbunit(353.0)
+        _ssed = (self._freqs/30.0)**_beta_s*self._cmbunit(self._freqs)/self._cmbunit(30.0)
+        return np.array([np.ones(self._fsize), _dsed, _ssed])
+
+    def skycl(self):
+        """
+        Angular power-spectra of sky components at reference frequencies.
+
+        Returns
+        -------
+
+        CMB, dust, synchrotron Cl : numpy.ndarray
+            with size (3, N_modes)
+        """
+        log.debug('@ skysim::skycl')
+        _ell = np.arange(self._lmin, self._lmax+1, dtype=np.float64)
+        _dl = np.array([self._cmb*np.exp(-(_ell/1500.0)**2),
+                        self._dust*(_ell/80.0)**(-0.42),
+                        self._sync*(_ell/80.0)**(-0.6)])
+        return _dl*2.0*np.pi/(_ell*(_ell+1.0))
+
+    def cmbcps(self):
+        """
+        CMB CROSS power-spectrum theory.
+
+        Returns
+        -------
+
+        CROSS-PS : numpy.ndarray
+            with size (N_modes, N_freq, N_freq)
+        """
+        log.debug('@ skysim::cmbcps')
+        _sed = self.seds()[0]
+        return self.skycl()[0][:,None,None]*np.outer(_sed, _sed)[None,:,:]
+
+    def fgcps(self):
+        """
+        Foreground CROSS power-spectrum theory.
+
+        Returns
+        -------
+
+        CROSS-PS : numpy.ndarray
+            with size (N_modes, N_freq, N_freq)
+        """
+        log.debug('@ skysim::fgcps')
+        _sed = self.seds()[1:]
+        return np.einsum('cl,ci,cj->lij', self.skycl()[1:], _sed, _sed)
+
+    def noisecps(self):
+        """
+        Ensemble averaged noise CROSS power-spectrum theory of the full data set.
+
+        Returns
+        -------
+
+        CROSS-PS : numpy.ndarray
+            with size (N_modes, N_freq, N_freq)
+        """
+        log.debug('@ skysim::noisecps')
+        _nl = (self._nlevel*np.pi/10800.0)**2  # uK-arcmin to uK-rad
+        return np.ones(self._lmax-self._lmin+1)[:,None,None]*np.diag(_nl)[None,:,:]
+
+    def _wishart(self, cov):
+        """
+        Sample estimate of power-spectrum matrices with given covariance,
+        by Bartlett decomposition of Wishart distribution,
+        with fsky*(2*ell+1) degrees of freedom at each angular mode
+        (no less than the matrix dimension).
+
+        Parameters
+        ----------
+
+        cov : numpy.ndarray
+            positive definite covariance with size (N_modes, N, N)
+
+        Returns
+        -------
+
+        realized power-spectrum matrices : numpy.ndarray
+            with size (N_modes, N, N)
+        """
+        _lsize, _n = cov.shape[0], cov.shape[1]
+        _dof = np.maximum(self._fsky*(2.0*np.arange(self._lmin, self._lmax+1)+1.0), _n)
+        _a = np.zeros((_lsize, _n, _n))
+        _il = np.tril_indices(_n, -1)
+        _a[:,_il[0],_il[1]] = self._rng.standard_normal((_lsize, len(_il[0])))
+        _a[:,range(_n),range(_n)] = np.sqrt(self._rng.chisquare(_dof[:,None]-np.arange(_n)[None,:]))
+        _la = np.matmul(np.linalg.cholesky(cov), _a)
+        return np.matmul(_la, np.transpose(_la, (0,2,1)))/_dof[:,None,None]
+
+    def signal(self):
+        """
+        Realization of the total (CMB + foreground + noise) CROSS power-spectrum.
+
+        Returns
+        -------
+
+        CROSS-PS : numpy.ndarray
+            with size (N_modes, N_freq, N_freq)
+        """
+        log.debug('@ skysim::signal')
+        return self._wishart(self.cmbcps()+self.fgcps()+self.noisecps())
+
+    def noise_iter(self):
+        """
+        Stream of noise CROSS power-spectrum realizations,
+        one at a time, for N_sim realizations.
+
+        Returns
+        -------
+
+        generator of CROSS-PS : numpy.ndarray
+            with size (N_modes, N_freq, N_freq)
+        """
+        log.debug('@ skysim::noise_iter')
+        _ncps = self.noisecps()
+        for i in range(self._nsim):
+            yield self._wishart(_ncps)
+
+    def noise(self):
+        """
+        Ensemble average of noise CROSS power-spectrum and RMS of noise AUTO power-spectrum,
+        accumulated over the stream of N_sim realizations (Welford's algorithm),
+        hence the memory usage does not scale with N_sim.
+
+        Returns
+        -------
+
+        noise CROSS-PS, RMS of noise AUTO-PS : (numpy.ndarray, numpy.ndarray)
+            with size (N_modes, N_freq, N_freq) and (N_modes, N_freq)
+        """
+        log.debug('@ skysim::noise')
+        _mean = np.zeros((self._lmax-self._lmin+1, self._fsize, self._fsize))
+        _m2 = np.zeros((self._lmax-self._lmin+1, self._fsize))
+        for i, _ncps in enumerate(self.noise_iter()):
+            _delta = np.diagonal(_ncps, axis1=1, axis2=2) - np.diagonal(_mean, axis1=1, axis2=2)
+            _mean += (_ncps - _mean)/(i+1)
+            _m2 += _delta*(np.diagonal(_ncps, axis1=1, axis2=2) - np.diagonal(_mean, axis1=1, axis2=2))
+        return _mean, np.sqrt(_m2/max(self._nsim-1, 1))
+
+    def splits(self):
+        """
+        Realization of split-cross power-spectra,
+        with the sky shared among N_split data splits,
+        and the noise level of each split raised by sqrt(N_split),
+        symmetrized for each pair of splits (a,b) with a < b,
+        along with the power-spectra of null maps (see split_nulls) of the same realization.
+
+        Returns
+        -------
+
+        split-cross PS, null map PS : (numpy.ndarray, numpy.ndarray)
+            with size (N_pairs, N_modes, N_freq, N_freq) and (N_split-1, N_modes, N_freq, N_freq)
+        """
+        log.debug('@ skysim::splits')
+        assert (self._nsplit > 1)
+        _cov = np.kron(np.ones((self._nsplit,self._nsplit)), self.cmbcps()+self.fgcps())
+        _cov += np.kron(np.eye(self._nsplit), self._nsplit*self.noisecps())
+        _cps = self._wishart(_cov)
+        _result = list()
+        for a in range(self._nsplit):
+            for b in range(a+1, self._nsplit):
+                _x = _cps[:, a*self._fsize:(a+1)*self._fsize, b*self._fsize:(b+1)*self._fsize]
+                _result.append(0.5*(_x + np.transpose(_x, (0,2,1))))
+        _t = np.kron(nullweights(self._nsplit), np.eye(self._fsize))
+        _ncps = np.matmul(np.matmul(_t, _cps), _t.T)
+        _null = [_ncps[:, k*self._fsize:(k+1)*self._fsize, k*self._fsize:(k+1)*self._fsize] for k in range(self._nsplit-1)]
+        return np.array(_result), np.array(_null)
+
+    def maps(self, pol=False, split=False):
+        """
+        Realization of total (CMB + foreground + noise) maps,
+        independent of the power-spectrum realizations,
+        requires healpy package.
+        In polarization, each sky component carries E and B modes
+        with the same (toy) angular power-spectrum as its temperature,
+        uncorrelated with it, and the Q/U noise level is raised by sqrt(2).
+
+        Parameters
+        ----------
+
+        pol : bool
+            If True, T/Q/U maps instead of temperature maps only.
+
+        split : bool
+            If True, maps of N_split data splits sharing the same sky,
+            with independent noise raised by sqrt(N_split) in each split.
+
+        Returns
+        -------
+
+        maps : numpy.ndarray
+            with size ([N_split,] N_freq, [3,] N_pix)
+        """
+        log.debug('@ skysim::maps')
+        _npol = 3 if pol else 1
+        _cl = np.zeros((3, self._lmax+1))
+        _cl[:,self._lmin:] = self.skycl()
+        # each sky component is a single field scaled among frequencies,
+        # with Gaussian alm drawn from own random state
+        _ell, _m = hp.Alm.getlm(self._lmax)
+        _alm = self._rng.standard_normal((3, _npol, len(_ell))) + 1j*self._rng.standard_normal((3, _npol, len(_ell)))
+        _alm *= np.sqrt(0.5*_cl[:,None,_ell])
+        _alm[...,_m == 0] = np.sqrt(2.0)*_alm[...,_m == 0].real
+        _sed = self.seds()
+        _npix = hp.nside2npix(self._nside)
+        _sky = np.empty((self._fsize, _npol, _npix))
+        for i in range(self._fsize):
+            _falm = np.tensordot(_sed[:,i], _alm, axes=1)
+            if pol:
+                _sky[i] = hp.alm2map(_falm, self._nside, lmax=self._lmax, pol=True)
+            else:
+                _sky[i,0] = hp.alm2map(_falm[0], self._nside, lmax=self._lmax)
+        _nrms = self._nlevel/hp.nside2resol(self._nside, arcmin=True)  # uK per pixel
+        _nrms = _nrms[:,None]*np.array([1.0, np.sqrt(2.0), np.sqrt(2.0)])[None,:_npol]
+        if split:
+            _result = _sky[None] + np.sqrt(self._nsplit)*_nrms[None,:,:,None]*self._rng.standard_normal((self._nsplit, self._fsize, _npol, _npix))
+        else:
+            _result = _sky + _nrms[:,:,None]*self._rng.standard_normal((self._fsize, _npol, _npix))
+        return _result if pol else _result[...,0,:]
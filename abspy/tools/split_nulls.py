@@ -0,0 +1,37 @@
+"""
+The signal-free null combinations of data splits.
+
+With N_split splits sharing the sky, and noise level of each split
+sqrt(N_split) times the full data one,
+the Helmert contrasts (orthonormal, orthogonal to the plain average)
+give N_split-1 null maps free of sky,
+each carrying noise of the full data level,
+and mutually independent for splits of equal noise.
+"""
+import numpy as np
+
+
+def nullweights(nsplit):
+    """
+    Weights of null maps as linear combinations of split maps.
+
+    Parameters
+    ----------
+
+    nsplit : (positive) integer
+        number of data splits, no less than 2
+
+    Returns
+    -------
+
+    weights : numpy.ndarray
+        with size (N_split-1, N_split)
+    """
+    assert isinstance(nsplit, int)
+    assert (nsplit > 1)
+    _w = np.zeros((nsplit-1, nsplit))
+    for k in range(1, nsplit):
+        _w[k-1,:k] = 1.0
+        _w[k-1,k] = -k
+        _w[k-1] /= np.sqrt(k*(k+1))
+    return _w/np.sqrt(nsplit)
@@ -7,6 +7,7 @@ setup(name="abspy",
       license="GPLv3",
       url="https://github.com/gioacchinowang/ABSpy",
       packages=find_packages(),
+      install_requires=['threadpoolctl'],
       dependency_links=[],
       python_requires='>=3.5',
       zip_safe=False,
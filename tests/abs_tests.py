@@ -1,6 +1,8 @@
 import unittest
 import numpy as np
+from unittest import mock
 from abspy.methods.abs import abssep
+from abspy.tools.sky_simulator import skysim
 
 class TestSeparator(unittest.TestCase):
     
@@ -86,6 +88,120 @@ class TestSeparator(unittest.TestCase):
                     self.assertAlmostEqual(test_cdl[i,j,k], check_cdl[i,j,k])
                     self.assertAlmostEqual(test_ndl[i,j,k], check_ndl[i,j,k])
     
+    def test_window(self):
+        test_ccl = np.random.rand(16,3,3)
+        test_ccl_noise = np.random.rand(16,3,3)
+        test_ccl_sigma = np.random.rand(16,3)
+        binsize = 3
+        test_sep = abssep(test_ccl,
+                          test_ccl_noise,
+                          test_ccl_sigma,
+                          binsize,
+                          lmin=3,
+                          lmax=12)
+        self.assertEqual((test_sep._lbegin, test_sep._lend), (3, 13))
+        self.assertListEqual(test_sep.binell, [4.5, 8., 11.])
+        # windowed binning equals binning of the sliced spectra
+        check_sep = abssep(test_ccl[3:13],
+                           test_ccl_noise[3:13],
+                           test_ccl_sigma[3:13],
+                           binsize,
+                           modes=[*range(3,13)])
+        self.assertListEqual(check_sep.binell, test_sep.binell)
+        test_cdl = test_sep.bincps(test_ccl)
+        check_cdl = check_sep.bincps(test_ccl[3:13])
+        test_rdl = test_sep.binaps(test_ccl_sigma)
+        check_rdl = check_sep.binaps(test_ccl_sigma[3:13])
+        for i in range(binsize):
+            for j in range(test_ccl.shape[1]):
+                self.assertAlmostEqual(test_rdl[i,j], check_rdl[i,j])
+                for k in range(test_ccl.shape[2]):
+                    self.assertAlmostEqual(test_cdl[i,j,k], check_cdl[i,j,k])
+        test_sep = abssep(test_ccl,
+                          bins=binsize,
+                          lmin=3,
+                          lmax=12)
+        check_sep = abssep(test_ccl[3:13],
+                           bins=binsize,
+                           modes=[*range(3,13)])
+        self.assertListEqual(list(test_sep()[1]), list(check_sep()[1]))
+    
+    def test_memory(self):
+        test_sim = skysim(64, [95.,150.,220.], nsplit=4, seed=234)
+        test_scl, test_ncl = test_sim.splits()
+        binsize = 16
+        test_sep = abssep(test_scl,
+                          bins=binsize,
+                          modes=test_sim.modes,
+                          split=True,
+                          null=test_ncl)
+        self.assertEqual(test_sep.batch, binsize)
+        self.assertDictEqual(test_sep.report, dict())
+        # budget just above the footprint of 3 bins per batch
+        test_budget = (test_sep.footprint(3)+1)/2**20
+        check_sep = abssep(test_scl,
+                           bins=binsize,
+                           modes=test_sim.modes,
+                           split=True,
+                           null=test_ncl,
+                           memory=test_budget)
+        self.assertEqual(check_sep.batch, 3)
+        self.assertLessEqual(check_sep.footprint(), test_budget*2**20)
+        self.assertListEqual(list(test_sep.signal.ravel()), list(check_sep.signal.ravel()))
+        self.assertListEqual(list(test_sep.sigma.ravel()), list(check_sep.sigma.ravel()))
+        self.assertListEqual(test_sep()[1], check_sep()[1])
+        self.assertListEqual(sorted(check_sep.report.keys()), ['run', 'split'])
+    
+    def test_threads(self):
+        test_sim = skysim(64, [95.,150.,220.], nsim=50, seed=234)
+        test_ccl = test_sim.signal()
+        binsize = 10
+        test_sep = abssep(test_ccl,
+                          bins=binsize,
+                          modes=test_sim.modes)
+        self.assertEqual(test_sep.nthreads, None)
+        self.assertEqual(test_sep.nworkers, 1)
+        check_sep = abssep(test_ccl,
+                           bins=binsize,
+                           modes=test_sim.modes,
+                           nthreads=1,
+                           nworkers=3)
+        self.assertEqual(check_sep.batch, 4)
+        self.assertListEqual(test_sep()[1], check_sep()[1])
+        # BLAS threads shared out among workers by default
+        with mock.patch('os.cpu_count', return_value=8):
+            check_sep = abssep(test_ccl,
+                               bins=binsize,
+                               nworkers=3)
+        self.assertEqual(check_sep.nthreads, 2)
+        with mock.patch('os.cpu_count', return_value=2):
+            check_sep = abssep(test_ccl,
+                               bins=binsize,
+                               nworkers=3)
+        self.assertEqual(check_sep.nthreads, 1)
+        # same result with noise, whatever the workers and batch size
+        test_ccl_noise, test_ccl_sigma = test_sim.noise()
+        test_sep = abssep(test_ccl,
+                          test_ccl_noise,
+                          test_ccl_sigma,
+                          binsize,
+                          modes=test_sim.modes)
+        test_result = test_sep()
+        self.assertTrue(np.all(np.isfinite(test_result[1])))
+        test_fixed = test_sep.footprint(0)
+        test_perbin = test_sep.footprint(1)-test_fixed
+        for test_nworkers in (1, 2, 4):
+            for test_batch in (1, 3, binsize):
+                check_sep = abssep(test_ccl,
+                                   test_ccl_noise,
+                                   test_ccl_sigma,
+                                   binsize,
+                                   modes=test_sim.modes,
+                                   memory=(test_fixed+test_perbin*test_batch*test_nworkers+1)/2**20,
+                                   nworkers=test_nworkers)
+                self.assertEqual(check_sep.batch, min(test_batch, -(-binsize//test_nworkers)))
+                self.assertListEqual(test_result[1], check_sep()[1])
+    
     def test_sainity(self):
         np.random.seed(234)
         test_ccl = np.random.rand(128,3,3)
@@ -98,5 +214,71 @@ class TestSeparator(unittest.TestCase):
                           binsize)
         test_result = test_sep()
 
+    def test_split(self):
+        test_sim = skysim(64, [95.,150.,220.], nsim=50, nsplit=4, seed=234)
+        test_scl, test_ncl = test_sim.splits()
+        test_modes = test_sim.modes
+        binsize = 3
+        test_sep = abssep(test_scl,
+                          bins=binsize,
+                          modes=test_modes,
+                          split=True,
+                          null=test_ncl)
+        self.assertTrue(test_sep.noise_flag)
+        self.assertEqual(test_sep._lsize, test_scl.shape[1])
+        self.assertEqual(test_sep._fsize, test_scl.shape[2])
+        for i in range(test_scl.shape[1]):
+            for j in range(test_scl.shape[2]):
+                self.assertAlmostEqual(test_sep.sigma[i,j], np.mean(test_ncl[:,i,j,j])*np.sqrt(2./(2.*test_modes[i]+1.)))
+                for k in range(test_scl.shape[3]):
+                    self.assertAlmostEqual(test_sep.signal[i,j,k], np.mean(test_scl[:,i,j,k]))
+        test_result = test_sep()
+        # explicit noise RMS overrides the null estimate
+        test_ccl_noise, test_ccl_sigma = test_sim.noise()
+        test_sep = abssep(test_scl,
+                          sigma=test_ccl_sigma,
+                          bins=binsize,
+                          modes=test_modes,
+                          split=True,
+                          null=test_ncl)
+        self.assertListEqual(list(test_sep.sigma[0]), list(test_ccl_sigma[0]))
+        # without null spectra nor noise RMS, no noise information
+        test_sep = abssep(test_scl,
+                          bins=binsize,
+                          modes=test_modes,
+                          split=True)
+        self.assertFalse(test_sep.noise_flag)
+        # split-cross PS carries no noise bias to subtract
+        with self.assertRaises(AssertionError):
+            abssep(test_scl,
+                   noise=test_ccl_noise,
+                   bins=binsize,
+                   split=True)
+        with self.assertRaises(AssertionError):
+            abssep(test_scl[0],
+                   bins=binsize,
+                   null=test_ncl)
+        # split pairs are reduced only within the window
+        test_sep = abssep(test_scl,
+                          sigma=test_ccl_sigma,
+                          bins=binsize,
+                          modes=test_modes,
+                          split=True,
+                          lmin=20,
+                          lmax=99,
+                          null=test_ncl)
+        self.assertEqual(test_sep.signal.shape, (80,3,3))
+        self.assertListEqual(test_sep.modes, test_modes[18:98])
+        self.assertListEqual(list(test_sep.sigma[0]), list(test_ccl_sigma[18]))
+        test_ref = abssep(test_scl[:,18:98],
+                          sigma=test_ccl_sigma[18:98],
+                          bins=binsize,
+                          modes=test_modes[18:98],
+                          split=True,
+                          null=test_ncl[:,18:98])
+        self.assertListEqual(test_sep.binell, test_ref.binell)
+        self.assertTrue(np.allclose(test_sep.signal, test_ref.signal))
+        self.assertTrue(np.allclose(test_sep.run()[1], test_ref.run()[1]))
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,67 @@
+import os
+import unittest
+from unittest import mock
+from abspy.tools import blas_threads
+from abspy.tools.blas_threads import blas_limits, pin_single_thread
+try:
+    import threadpoolctl
+except ImportError:
+    threadpoolctl = None
+
+class TestThreads(unittest.TestCase):
+
+    def test_limits(self):
+        test_limits = mock.MagicMock()
+        with mock.patch.object(blas_threads, 'threadpool_limits', test_limits):
+            # unlimited, left to the BLAS library
+            with blas_limits(None):
+                pass
+            test_limits.assert_not_called()
+            with blas_limits(2):
+                test_limits.assert_called_once_with(limits=2, user_api='blas')
+                test_limits.return_value.__enter__.assert_called_once()
+                test_limits.return_value.__exit__.assert_not_called()
+            test_limits.return_value.__exit__.assert_called_once()
+
+    def test_warning(self):
+        # without threadpoolctl, no limit nor failure, warned once per process
+        with mock.patch.object(blas_threads, 'threadpool_limits', None), mock.patch.object(blas_threads, '_warned', set()):
+            with self.assertLogs(level='WARNING') as test_logs:
+                for i in range(3):
+                    with blas_limits(2):
+                        pass
+                with mock.patch.dict(os.environ):
+                    for i in range(3):
+                        pin_single_thread()
+            self.assertEqual(len(test_logs.output), 2)
+
+    def test_pin(self):
+        test_limits = mock.MagicMock()
+        with mock.patch.dict(os.environ):
+            with mock.patch.object(blas_threads, 'threadpool_limits', test_limits):
+                pin_single_thread()
+            for test_var in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS'):
+                self.assertEqual(os.environ[test_var], '1')
+            test_limits.assert_called_once_with(limits=1, user_api='blas')
+
+    @unittest.skipIf(threadpoolctl is None, 'threadpoolctl not available')
+    def test_blas(self):
+        # BLAS loaded by numpy is actually limited, original limits restored on exit
+        test_info = [i for i in threadpoolctl.threadpool_info() if i['user_api'] == 'blas']
+        if not test_info:
+            self.skipTest('no BLAS library found by threadpoolctl')
+        with threadpoolctl.threadpool_limits(limits=2, user_api='blas'):
+            with blas_limits(1):
+                for i in threadpoolctl.threadpool_info():
+                    if i['user_api'] == 'blas':
+                        self.assertEqual(i['num_threads'], 1)
+            with mock.patch.dict(os.environ):
+                pin_single_thread()
+            for i in threadpoolctl.threadpool_info():
+                if i['user_api'] == 'blas':
+                    self.assertEqual(i['num_threads'], 1)
+        self.assertListEqual([i['num_threads'] for i in threadpoolctl.threadpool_info() if i['user_api'] == 'blas'],
+                             [i['num_threads'] for i in test_info])
+
+if __name__ == '__main__':
+    unittest.main()
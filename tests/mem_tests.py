@@ -0,0 +1,48 @@
+import unittest
+import numpy as np
+from abspy.tools.mem_tracer import memtracer
+
+class TestTracer(unittest.TestCase):
+
+    def test_budget(self):
+        test_tracer = memtracer()
+        self.assertTrue(test_tracer.fits(2**40))
+        with test_tracer.stage('idle'):
+            pass
+        self.assertDictEqual(test_tracer.report, dict())
+        test_tracer = memtracer(1.)
+        self.assertTrue(test_tracer.fits(2**20))
+        self.assertFalse(test_tracer.fits(2**20+1))
+        with self.assertRaises(AssertionError):
+            memtracer(-1.)
+
+    def test_nested(self):
+        test_tracer = memtracer(1.e+3)
+        with test_tracer.stage('outer'):
+            test_array = np.ones(2**22)  # 32 MB
+            del test_array
+            with test_tracer.stage('inner'):
+                test_array = np.ones(2**20)  # 8 MB
+                del test_array
+        test_report = test_tracer.report
+        self.assertListEqual(sorted(test_report.keys()), ['inner', 'outer'])
+        for test_stage in test_report.values():
+            self.assertListEqual(sorted(test_stage.keys()), ['heap_peak', 'process_maxrss', 'rss_delta', 'rss_peak'])
+        # outer peak before the nested stage is kept
+        self.assertGreater(test_report['outer']['heap_peak'], 31.)
+        self.assertGreater(test_report['inner']['heap_peak'], 7.)
+        self.assertLess(test_report['inner']['heap_peak'], 16.)
+        if test_report['outer']['rss_peak'] is not None:
+            self.assertGreaterEqual(test_report['outer']['rss_peak'], test_report['inner']['rss_peak'])
+
+    def test_repeat(self):
+        test_tracer = memtracer(1.e+3)
+        with test_tracer.stage('repeat'):
+            test_array = np.ones(2**22)
+            del test_array
+        with test_tracer.stage('repeat'):
+            pass
+        self.assertGreater(test_tracer.report['repeat']['heap_peak'], 31.)
+
+if __name__ == '__main__':
+    unittest.main()
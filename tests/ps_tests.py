@@ -0,0 +1,122 @@
+import unittest
+import numpy as np
+import pymaster as nmt
+from abspy.tools.ps_estimator import pstimator, _pairs
+from abspy.tools.sky_simulator import skysim
+
+class _units(object):
+    """
+    Stand-in for split fields, counting builds and fields held.
+    """
+    def __init__(self, n):
+        self._n = n
+        self.built = 0
+        self.alive = 0
+        self.most = 0
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, s):
+        self.built += 1
+        return _unit(self, s)
+
+class _unit(object):
+    def __init__(self, units, s):
+        self._units = units
+        self.s = s
+        units.alive += 1
+        units.most = max(units.most, units.alive)
+
+    def __del__(self):
+        self._units.alive -= 1
+
+class TestEstimator(unittest.TestCase):
+
+    def test_footprint(self):
+        test_ps = pstimator()
+        test_npix = 12*16**2
+        test_field = test_npix*8 + (48*49//2)*16
+        self.assertEqual(test_ps.footprint(16), 2*test_npix*8)
+        self.assertEqual(test_ps.footprint(16, nfield0=3), 2*test_npix*8 + 3*test_field + 48**2*8)
+        self.assertEqual(test_ps.footprint(16, nfield2=3), 2*test_npix*8 + 6*test_field + (4*48)**2*8)
+        test_field = test_npix*8 + (21*22//2)*16
+        self.assertEqual(test_ps.footprint(16, nfield0=1, nfield2=1, lmax=20), 2*test_npix*8 + 3*test_field + 21**2*8 + 84**2*8)
+
+    def test_lmaxsht(self):
+        test_ps = pstimator()
+        self.assertEqual(test_ps._lmaxsht(64, 1.0), 191)
+        # margin of twice 180/aposcale modes beyond lmax
+        self.assertEqual(test_ps._lmaxsht(64, 6.0, 50), 110)
+        self.assertEqual(test_ps._lmaxsht(64, 4.0, 100), 190)
+        self.assertEqual(test_ps._lmaxsht(64, 7.0, 50), 102)
+        # no more than 3*nside-1
+        self.assertEqual(test_ps._lmaxsht(64, 1.0, 50), 191)
+
+    def test_capacity(self):
+        test_ps = pstimator()
+        self.assertEqual(test_ps._capacity(16, 6, nfield0=2), 6)
+        for test_nsplit in range(2, 7):
+            test_ps = pstimator(memory=(pstimator().footprint(16, nfield0=2*test_nsplit)+1)/2**20)
+            self.assertEqual(test_ps._capacity(16, 6, nfield0=2), max(test_nsplit-1, 1) if test_nsplit < 6 else 6)
+        test_ps = pstimator(memory=1.e-3)
+        self.assertEqual(test_ps._capacity(16, 6, nfield2=1), 1)
+
+    def test_pairs(self):
+        for test_n in range(2, 7):
+            for test_capacity in range(1, test_n+1):
+                test_units = _units(test_n)
+                test_pairs = list()
+                for a, b, ua, ub in _pairs(test_units, test_capacity):
+                    test_pairs.append((a, b, ua.s, ub.s))
+                    del ua, ub
+                self.assertListEqual(sorted((a, b) for a, b, sa, sb in test_pairs),
+                                     [(a, b) for a in range(test_n) for b in range(a+1, test_n)])
+                self.assertListEqual([(a, b) for a, b, sa, sb in test_pairs], [(sa, sb) for a, b, sa, sb in test_pairs])
+                self.assertEqual(test_units.alive, 0)
+                # each split built once per preceding block and once in its own block
+                self.assertEqual(test_units.built, sum(s//test_capacity+1 for s in range(test_n)))
+                self.assertLessEqual(test_units.most, test_capacity+int(test_capacity < test_n))
+        # all splits held once
+        test_units = _units(6)
+        list(_pairs(test_units, 6))
+        self.assertEqual(test_units.built, 6)
+
+    @unittest.skipUnless(hasattr(nmt, 'NmtBin'), 'NaMaster not available')
+    def test_binning(self):
+        test_ps = pstimator()
+        test_b = test_ps._binning(16, 5, 10, 40)
+        self.assertTrue(np.allclose(test_b.get_effective_ells(), [12.,17.,22.,27.,32.,37.]))
+        test_b = test_ps._binning(16)
+        self.assertEqual(test_b.get_n_bands(), nmt.NmtBin(16, nlb=16).get_n_bands())
+        with self.assertRaises(AssertionError):
+            test_ps._binning(16, 16, 10, 20)
+
+    @unittest.skipUnless(hasattr(nmt, 'NmtField'), 'NaMaster not available')
+    def test_split(self):
+        test_sim = skysim(16, [95.,150.], nsplit=4, seed=234)
+        test_maps = test_sim.maps(pol=True, split=True)
+        test_mask = np.ones(test_maps.shape[-1])
+        test_ps = pstimator()
+        test_result = test_ps.split_teb(test_maps[:,0], test_mask, binning=8)
+        self.assertEqual(len(test_result), 7)
+        for test_cl in test_result[1:4]:
+            self.assertEqual(test_cl.shape, (6, len(test_result[0])))
+        for test_cl in test_result[4:]:
+            self.assertEqual(test_cl.shape, (3, len(test_result[0])))
+        # fields held in blocks under a tight budget give the same PS
+        check_ps = pstimator(memory=(pstimator().footprint(16, nfield2=2)+1)/2**20)
+        self.assertEqual(check_ps._capacity(16, 4, nfield2=1), 1)
+        check_result = check_ps.split_teb(test_maps[:,0], test_mask, binning=8)
+        for test_cl, check_cl in zip(test_result, check_result):
+            self.assertTrue(np.allclose(test_cl, check_cl))
+        self.assertListEqual(list(check_ps.report.keys()), ['split_teb'])
+        # split TT of two bands, symmetrized
+        test_result = test_ps.split_t(test_maps[:,:,0], test_mask, binning=8)
+        check_result = check_ps.split_t(test_maps[:,:,0], test_mask, binning=8)
+        self.assertEqual(test_result[1].shape, (6, len(test_result[0])))
+        for test_cl, check_cl in zip(test_result, check_result):
+            self.assertTrue(np.allclose(test_cl, check_cl))
+
+if __name__ == '__main__':
+    unittest.main()
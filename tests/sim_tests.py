@@ -0,0 +1,110 @@
+import unittest
+import numpy as np
+import healpy as hp
+from abspy.tools.sky_simulator import skysim
+from abspy.methods.abs import abssep
+from abspy.tools.split_nulls import nullweights
+
+class TestSimulator(unittest.TestCase):
+    
+    def test_init(self):
+        test_freqs = [95.,150.,220.]
+        test_sim = skysim(16, test_freqs)
+        self.assertEqual(test_sim.lmin, 2)
+        self.assertEqual(test_sim.lmax, 47)
+        self.assertListEqual(test_sim.modes, [*range(2,48)])
+        self.assertListEqual(list(test_sim.nlevel), [1.0,1.0,1.0])
+        test_sim = skysim(16, test_freqs, nlevel=[1.,2.,3.], lmin=10, lmax=20)
+        self.assertListEqual(list(test_sim.nlevel), [1.,2.,3.])
+        self.assertListEqual(test_sim.modes, [*range(10,21)])
+        
+    def test_cps(self):
+        test_sim = skysim(16, [30.,95.,150.,220.,353.], seed=234)
+        test_scps = test_sim.cmbcps()+test_sim.fgcps()
+        test_tcps = test_scps+test_sim.noisecps()
+        self.assertEqual(test_tcps.shape, (46,5,5))
+        # symmetric and positive (semi-)definite
+        self.assertTrue(np.allclose(test_tcps, np.transpose(test_tcps, (0,2,1))))
+        self.assertTrue(np.all(np.linalg.eigvalsh(test_scps) > -1.e-12*np.max(test_scps)))
+        self.assertTrue(np.all(np.linalg.eigvalsh(test_tcps) > 0))
+        test_cps = test_sim.signal()
+        self.assertEqual(test_cps.shape, (46,5,5))
+        self.assertTrue(np.allclose(test_cps, np.transpose(test_cps, (0,2,1))))
+        self.assertTrue(np.all(np.linalg.eigvalsh(test_cps) > 0))
+        # realizations scatter around theory
+        test_sim = skysim(64, [95.,150.], nsim=200, seed=234)
+        test_ncps, test_nrms = test_sim.noise()
+        test_theory = test_sim.noisecps()
+        self.assertTrue(np.allclose(np.mean(test_ncps, axis=0), np.mean(test_theory, axis=0), rtol=0.01, atol=1.e-3*test_theory[0,0,0]))
+        self.assertEqual(test_nrms.shape, (190,2))
+        
+    def test_seed(self):
+        test_sim = skysim(16, [95.,150.], nsim=3, seed=234)
+        check_sim = skysim(16, [95.,150.], nsim=3, seed=234)
+        self.assertTrue(np.array_equal(test_sim.signal(), check_sim.signal()))
+        for test_ncps, check_ncps in zip(test_sim.noise_iter(), check_sim.noise_iter()):
+            self.assertTrue(np.array_equal(test_ncps, check_ncps))
+        for test_cps, check_cps in zip(test_sim.splits(), check_sim.splits()):
+            self.assertTrue(np.array_equal(test_cps, check_cps))
+        self.assertTrue(np.array_equal(test_sim.maps(), check_sim.maps()))
+        
+    def test_splits(self):
+        test_sim = skysim(16, [95.,150.,220.], nsplit=4, seed=234)
+        test_scps, test_ncps = test_sim.splits()
+        self.assertEqual(test_scps.shape, (6,46,3,3))
+        self.assertEqual(test_ncps.shape, (3,46,3,3))
+        self.assertTrue(np.allclose(test_scps, np.transpose(test_scps, (0,1,3,2))))
+        self.assertTrue(np.allclose(test_ncps, np.transpose(test_ncps, (0,1,3,2))))
+        # null weights are orthonormal contrasts, scaled to the full data noise level
+        test_w = nullweights(4)
+        self.assertTrue(np.allclose(np.sum(test_w, axis=1), 0.))
+        self.assertTrue(np.allclose(np.dot(test_w, test_w.T), np.eye(3)/4.))
+        
+    def test_split_noise(self):
+        # noise RMS estimated from null maps matches the one from noise simulations,
+        # also with a single null map of two splits,
+        # low modes excluded, where the degrees of freedom are raised to the split matrix size
+        for test_nsplit in (2, 3, 4, 8):
+            test_sim = skysim(64, [95.,150.], nsim=300, nsplit=test_nsplit, fsky=0.5, lmin=16, cmb=10., seed=234)
+            test_scps, test_ncps = test_sim.splits()
+            test_sep = abssep(test_scps,
+                              bins=8,
+                              modes=test_sim.modes,
+                              split=True,
+                              null=test_ncps,
+                              fsky=0.5)
+            check_nrms = test_sim.noise()[1]
+            test_ratio = test_sep.binaps(test_sep.sigma)/test_sep.binaps(check_nrms)
+            for i in range(test_ratio.shape[0]):
+                for j in range(test_ratio.shape[1]):
+                    self.assertLess(abs(test_ratio[i,j]-1.), 0.1)
+            self.assertLess(abs(np.mean(test_ratio)-1.), 0.03)
+        
+    def test_maps(self):
+        test_sim = skysim(16, [95.,150.,220.], seed=234)
+        test_maps = test_sim.maps()
+        self.assertEqual(test_maps.shape, (3,3072))
+        self.assertEqual(test_sim.maps(pol=True).shape, (3,3,3072))
+        test_maps = test_sim.maps(pol=True, split=True)
+        self.assertEqual(test_maps.shape, (4,3,3,3072))
+        self.assertEqual(test_sim.maps(split=True).shape, (4,3,3072))
+        # split differences are sky free, with noise of two splits
+        test_nrms = np.sqrt(2.*4.)/hp.nside2resol(16, arcmin=True)
+        for i in range(3):
+            test_diff = test_maps[0,i] - test_maps[1,i]
+            self.assertLess(abs(np.std(test_diff[0])/test_nrms-1.), 0.1)
+            self.assertLess(abs(np.std(test_diff[1:])/(np.sqrt(2.)*test_nrms)-1.), 0.1)
+        
+    def test_abs(self):
+        test_sim = skysim(64, [95.,150.,220.,270.], fsky=0.5, cmb=10., seed=234)
+        test_sep = abssep(test_sim.signal(),
+                          bins=10,
+                          modes=test_sim.modes)
+        test_result = test_sep()
+        check_result = test_sep.bincps(test_sim.cmbcps())[:,0,0]
+        # recovered CMB band power within cosmic variance beyond the first bin
+        for i in range(1,10):
+            self.assertLess(abs(test_result[1][i]/check_result[i]-1.), 0.2)
+
+if __name__ == '__main__':
+    unittest.main()